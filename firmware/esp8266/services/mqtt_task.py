@@ -74,6 +74,12 @@ async def mqtt_task(period = 1.0):
                 client.publish("co2_monitor/tvoc", str(var.tvoc))
             if var.lux is not None:
                 client.publish("co2_monitor/lux", str(var.lux))
+            if var.sd_health is not None:
+                client.publish("co2_monitor/sd_health", var.sd_health)
+            for key, value in var.stats.items():
+                client.publish("co2_monitor/stats/" + key, value)
+            for key, value in var.i2c_stats.items():
+                client.publish("co2_monitor/i2c/" + key, value)
                 
             await asyncio.sleep(0.1)
             log.info("Disconnecting from MQTT server...")
@@ -58,6 +58,12 @@ async def serial_task(period = 1.0):
             else:
                 return b"NTP was not synchronized\r\n"
         
+        if "STATS:" in r:
+            # Rolling statistics: field,window,count,mean,std,min,max,p50,p95
+            data_array = r[6:].split(",", 2)
+            var.stats[data_array[0] + "/" + data_array[1]] = data_array[2]
+            return None
+
         if "TEMP:" in r:
             data_array = r[5:].split(",")
             var.temperature = float(data_array[0])
@@ -84,6 +90,17 @@ async def serial_task(period = 1.0):
             var.lux = float(data_array[0])
             return None
 
+        if "I2C:" in r:
+            # I2C device statistics: name,tr/s,B/s,mean ms,max ms,NACKs,timeouts
+            data_array = r[4:].split(",", 1)
+            var.i2c_stats[data_array[0]] = data_array[1]
+            return None
+
+        if "SD:" in r:
+            # SD card health summary, forwarded as is
+            var.sd_health = r[3:]
+            return None
+
         # default: echo
         return "ECHO {}\r\n".format(r).encode()
 
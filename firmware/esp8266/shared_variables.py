@@ -41,4 +41,7 @@ tvoc = None
 co2 = None
 co2_peak = None
 co2_detected = None
-lux = None
\ No newline at end of file
+lux = None
+sd_health = None
+stats = {}   # "<field>/<window>" -> "count,mean,std,min,max,p50,p95"
+i2c_stats = {}   # "<device>" -> "tr/s,B/s,mean ms,max ms,NACKs,timeouts"
\ No newline at end of file
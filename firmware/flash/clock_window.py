@@ -0,0 +1,117 @@
+import time
+
+def rtc_seconds(t):
+    """
+    RTC tuple (system_data.time_rtc) -> seconds since 2000-01-01,
+    None until the RTC was read.
+    """
+    if type(t) != tuple:
+        return None
+    return time.mktime((t[0], t[1], t[2], t[4], t[5], t[6], 0, 0))
+
+class ClockWindow:
+    """
+    Wall-clock aligned aggregation windows driven by the RTC.
+    `periods` are window lengths in seconds, each a multiple of the one
+    before it (e.g. 60, 300, 3600), so windows close on :00, :05, ... of the
+    RTC. Samples go into the shortest window; a closed window is folded into
+    the next longer one, so every level averages the same samples once.
+
+    When level L closes, record[L] holds the mean of every field (None if it
+    had no samples), record_ts[L] the window start and seq[L] is incremented.
+    The last `depth` closed windows of every level are also queued, so a
+    consumer that missed some closes can still read them with closed().
+    history_task feeds the samples, history and storage consume the records.
+    """
+    def __init__(self, fields, periods, depth=4):
+        for i in range(1, len(periods)):
+            assert periods[i] % periods[i - 1] == 0, \
+                "window of {} s is not a multiple of {} s".format(periods[i], periods[i - 1])
+        self.fields = fields
+        self.periods = periods
+        n = len(fields)
+        levels = len(periods)
+        self.depth = depth
+        self.queue = [[[None] * n for _ in range(depth)] for _ in range(levels)]
+        self.queue_ts = [[0] * depth for _ in range(levels)]
+        self.sum = [[0.0] * n for _ in range(levels)]
+        self.count = [[0] * n for _ in range(levels)]
+        self.end = [None] * levels
+        self.seq = [0] * levels
+        self.record = [[None] * n for _ in range(levels)]
+        self.record_ts = [0] * levels
+
+    def level(self, period):
+        """Level number of a window length."""
+        assert period in self.periods, \
+            "no window of {} s, the windows are {}".format(period, self.periods)
+        return self.periods.index(period)
+
+    def closed(self, level, seq):
+        """
+        (window start, record) of the window that made seq[level] == seq,
+        None when it is no longer queued. The record is reused, copy it
+        before the next close.
+        """
+        if seq <= 0 or seq > self.seq[level] or self.seq[level] - seq >= self.depth:
+            return None
+        i = seq % self.depth
+        return self.queue_ts[level][i], self.queue[level][i]
+
+    def _close(self, level):
+        s = self.sum[level]
+        c = self.count[level]
+        rec = self.record[level]
+        up = level + 1 < len(self.periods)
+        for i in range(len(self.fields)):
+            rec[i] = s[i] / c[i] if c[i] else None
+            if up:
+                self.sum[level + 1][i] += s[i]
+                self.count[level + 1][i] += c[i]
+            s[i] = 0.0
+            c[i] = 0
+        self.record_ts[level] = self.end[level] - self.periods[level]
+        self.seq[level] += 1
+        i = self.seq[level] % self.depth
+        self.queue[level][i][:] = rec
+        self.queue_ts[level][i] = self.record_ts[level]
+
+    def add(self, now, values):
+        """
+        Add one sample per field (`values` in the order of `fields`, None is
+        skipped) taken at RTC second `now`. Returns a bitmask of the levels
+        that closed before the sample was added.
+        """
+        closed = 0
+        # Clock set backwards (e.g. an NTP correction): the samples of the
+        # windows in progress are dropped, they don't belong to the windows
+        # of `now`. Every longer window contains the shortest one, so checking
+        # the shortest is enough.
+        if self.end[0] is not None and now < self.end[0] - self.periods[0]:
+            for level in range(len(self.periods)):
+                s = self.sum[level]
+                c = self.count[level]
+                for i in range(len(self.fields)):
+                    s[i] = 0.0
+                    c[i] = 0
+                self.end[level] = None
+
+        for level in range(len(self.periods)):
+            p = self.periods[level]
+            end = self.end[level]
+            if end is not None and now >= end:
+                self._close(level)
+                closed |= 1 << level
+            if end is None or now >= end:
+                # First sample or next window: the window of `now` ends on
+                # the next boundary
+                self.end[level] = now - now % p + p
+
+        s = self.sum[0]
+        c = self.count[0]
+        for i in range(len(self.fields)):
+            v = values[i]
+            if v is not None:
+                s[i] += v
+                c[i] += 1
+        return closed
@@ -14,6 +14,7 @@ examples/simpletest.py for a demo of the usage.
 from micropython import const
 
 from machine import I2C
+from drivers2.i2c_device import I2CDevice
 
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_DRV2605.git"
@@ -78,14 +79,10 @@ class DRV2605:
     :param int address: The I2C address
     """
 
-    # Class-level buffer for reading and writing data with the sensor.
-    # This reduces memory allocations but means the code is not re-entrant or
-    # thread safe!
-    _BUFFER = bytearray(1)
-
     def __init__(self, i2c: I2C, address: int = _DRV2605_ADDR) -> None:
         self._device = i2c
         self._address = address
+        self._dev = I2CDevice(i2c, address, 1)
         # Check chip ID is 3 or 7 (DRV2605 or DRV2605L).
         status = self._read_u8(_DRV2605_REG_STATUS)
         device_id = (status >> 5) & 0x07
@@ -116,13 +113,11 @@ class DRV2605:
 
     def _read_u8(self, address: int) -> int:
         # Read an 8-bit unsigned value from the specified 8-bit address.
-        self._device.readfrom_mem_into(self._address, address, self._BUFFER)
-        return self._BUFFER[0]
+        return self._dev.read_u8(address)
 
     def _write_u8(self, address: int, val: int) -> None:
         # Write an 8-bit unsigned value to the specified 8-bit address.
-        self._BUFFER[0] = val & 0xFF
-        self._device.writeto_mem(self._address, address, self._BUFFER)
+        self._dev.write_u8(address, val)
 
     def play(self) -> None:
         """Play back the select effect(s) on the motor."""
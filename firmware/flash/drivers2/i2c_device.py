@@ -0,0 +1,42 @@
+class I2CDevice:
+    """
+    Register access of one I2C device without allocating: every transaction
+    goes through readfrom_mem_into / writeto_mem on a preallocated buffer.
+    `size` is the longest transfer of the device. A returned view is only
+    valid until the next transaction of the same device.
+    """
+    def __init__(self, i2c, address, size=8):
+        self.i2c = i2c
+        self.address = address
+        self._buf = bytearray(size)
+        mv = memoryview(self._buf)
+        # Slicing a memoryview allocates, so keep one view per length
+        self._views = [mv[:n] for n in range(size + 1)]
+
+    def view(self, n):
+        """Preallocated view of the first n bytes of the buffer, to fill and write()."""
+        return self._views[n]
+
+    def read(self, reg, n):
+        """Read n bytes starting at `reg` -> view of the buffer."""
+        buf = self._views[n]
+        self.i2c.readfrom_mem_into(self.address, reg, buf)
+        return buf
+
+    def readinto(self, reg, buf):
+        self.i2c.readfrom_mem_into(self.address, reg, buf)
+
+    def write(self, reg, buf):
+        self.i2c.writeto_mem(self.address, reg, buf)
+
+    def read_u8(self, reg):
+        return self.read(reg, 1)[0]
+
+    def write_u8(self, reg, value):
+        buf = self._views[1]
+        buf[0] = value & 0xFF
+        self.i2c.writeto_mem(self.address, reg, buf)
+
+    def read_u16_le(self, reg):
+        buf = self.read(reg, 2)
+        return buf[0] | (buf[1] << 8)
@@ -1,18 +1,20 @@
 import ustruct
 import time
+from drivers2.i2c_device import I2CDevice
 
 
 class PCA9685:
     def __init__(self, i2c, address=0x40):
         self.i2c = i2c
         self.address = address
+        self._dev = I2CDevice(i2c, address, 4)
         self.reset()
 
     def _write(self, address, value):
-        self.i2c.writeto_mem(self.address, address, bytearray([value]))
+        self._dev.write_u8(address, value)
 
     def _read(self, address):
-        return self.i2c.readfrom_mem(self.address, address, 1)[0]
+        return self._dev.read_u8(address)
 
     def reset(self):
         self._write(0x00, 0x00) # Mode1
@@ -40,10 +42,11 @@ class PCA9685:
 
     def pwm(self, index, on=None, off=None):
         if on is None or off is None:
-            data = self.i2c.readfrom_mem(self.address, 0x06 + 4 * index, 4)
+            data = self._dev.read(0x06 + 4 * index, 4)
             return ustruct.unpack('<HH', data)
-        data = ustruct.pack('<HH', on, off)
-        self.i2c.writeto_mem(self.address, 0x06 + 4 * index,  data)
+        data = self._dev.view(4)
+        ustruct.pack_into('<HH', data, 0, on, off)
+        self._dev.write(0x06 + 4 * index, data)
 
     def duty(self, index, value=None, invert=False):
         if value is None:
@@ -0,0 +1,231 @@
+import uasyncio as asyncio
+import time
+import errno
+from array import array
+
+PRIO_HIGH = 0     # user feedback: LED, haptics
+PRIO_NORMAL = 1   # RTC
+PRIO_LOW = 2      # sensor reads, bus scan
+
+class _Hold:
+    """`async with bus.hold(prio):` context, one cached instance per priority."""
+    def __init__(self, bus, prio):
+        self.bus = bus
+        self.prio = prio
+
+    async def __aenter__(self):
+        await self.bus.acquire(self.prio)
+        return self.bus.i2c
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.bus.release()
+        return False
+
+
+class I2CBus:
+    """
+    Arbiter of one shared I2C bus. Every transaction holds the bus through
+    `async with bus.hold(prio) as i2c:`. When the bus is busy the coroutine is
+    queued, and on release the bus goes to the waiter with the highest
+    priority (lowest number), first come first served within a priority.
+    So the LED doesn't wait behind a queue of sensor reads, only behind the
+    transaction in progress.
+
+    Queue depth and the busy time are tracked for system_data.
+    """
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self._busy = False
+        self._waiters = []          # (prio, seq, event), sorted
+        self._seq = 0
+        self._holds = [_Hold(self, p) for p in (PRIO_HIGH, PRIO_NORMAL, PRIO_LOW)]
+        self.max_depth = 0          # deepest queue since the last utilisation()
+        self._busy_us = 0
+        self._t_acquire = 0
+        self._t_window = time.ticks_us()
+
+    def hold(self, prio=PRIO_LOW):
+        return self._holds[prio]
+
+    def depth(self):
+        """Coroutines waiting for the bus."""
+        return len(self._waiters)
+
+    async def acquire(self, prio=PRIO_LOW):
+        if self._busy or self._waiters:
+            ev = asyncio.Event()
+            entry = (prio, self._seq, ev)
+            self._seq += 1
+            i = 0
+            while i < len(self._waiters) and self._waiters[i][0] <= prio:
+                i += 1
+            self._waiters.insert(i, entry)
+            if len(self._waiters) > self.max_depth:
+                self.max_depth = len(self._waiters)
+            try:
+                await ev.wait()     # release() hands the bus over, _busy stays set
+            except asyncio.CancelledError:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                else:
+                    # granted while being cancelled, pass it on (held for ~0 us)
+                    self._t_acquire = time.ticks_us()
+                    self.release()
+                raise
+        else:
+            self._busy = True
+        self._t_acquire = time.ticks_us()
+
+    def release(self):
+        self._busy_us += time.ticks_diff(time.ticks_us(), self._t_acquire)
+        if self._waiters:
+            self._waiters.pop(0)[2].set()
+        else:
+            self._busy = False
+
+    def utilisation(self):
+        """Busy fraction of the bus since the last call, 0..1. Resets max_depth."""
+        now = time.ticks_us()
+        elapsed = time.ticks_diff(now, self._t_window)
+        busy = self._busy_us
+        if self._busy:
+            # the transaction in progress counts up to now
+            busy += time.ticks_diff(now, self._t_acquire)
+            self._busy_us = -time.ticks_diff(now, self._t_acquire)
+        else:
+            self._busy_us = 0
+        self._t_window = now
+        self.max_depth = len(self._waiters)
+        return min(busy / elapsed, 1.0) if elapsed > 0 else 0.0
+
+
+# OSError errno of a failed transaction (STM32 port): address / data NACK, timeout
+_NACK_ERRNOS = (errno.EIO, errno.ENODEV)
+_TIMEOUT_ERRNO = errno.ETIMEDOUT
+
+class InstrumentedI2C:
+    """
+    machine.I2C wrapper that counts and times every transaction per device
+    address: transactions, bytes, total and max latency, NACKs and timeouts.
+    Drivers get it in place of the I2C object. `addresses` are the known
+    devices, any other address and scan() are accounted in one extra slot.
+    The methods have fixed signatures, no *args, so a call doesn't allocate.
+    """
+    def __init__(self, i2c, addresses):
+        self.i2c = i2c
+        self._slot = {}
+        for i, address in enumerate(addresses):
+            self._slot[address] = i
+        n = len(addresses) + 1
+        self._other = n - 1
+        self.count = array("I", [0] * n)
+        self.bytes = array("I", [0] * n)
+        self.time_us = array("I", [0] * n)
+        self.max_us = array("I", [0] * n)     # since the last window()
+        self.nacks = array("I", [0] * n)
+        self.timeouts = array("I", [0] * n)
+        self._prev_count = array("I", [0] * n)
+        self._prev_bytes = array("I", [0] * n)
+        self._prev_time_us = array("I", [0] * n)
+        self._t_window = time.ticks_ms()
+
+    def _account(self, addr, t0, nbytes):
+        dt = time.ticks_diff(time.ticks_us(), t0)
+        i = self._slot.get(addr, self._other)
+        # the totals wrap at 32 bits, window() takes the differences modulo
+        self.count[i] = (self.count[i] + 1) & 0xFFFFFFFF
+        self.bytes[i] = (self.bytes[i] + nbytes) & 0xFFFFFFFF
+        self.time_us[i] = (self.time_us[i] + dt) & 0xFFFFFFFF
+        if dt > self.max_us[i]:
+            self.max_us[i] = dt
+
+    def _failed(self, addr, t0, e):
+        self._account(addr, t0, 0)
+        i = self._slot.get(addr, self._other)
+        if e.args and e.args[0] == _TIMEOUT_ERRNO:
+            self.timeouts[i] += 1
+        elif e.args and e.args[0] in _NACK_ERRNOS:
+            self.nacks[i] += 1
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        t0 = time.ticks_us()
+        try:
+            self.i2c.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
+        except OSError as e:
+            self._failed(addr, t0, e)
+            raise
+        self._account(addr, t0, len(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        t0 = time.ticks_us()
+        try:
+            data = self.i2c.readfrom_mem(addr, memaddr, nbytes, addrsize=addrsize)
+        except OSError as e:
+            self._failed(addr, t0, e)
+            raise
+        self._account(addr, t0, nbytes)
+        return data
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        t0 = time.ticks_us()
+        try:
+            self.i2c.writeto_mem(addr, memaddr, buf, addrsize=addrsize)
+        except OSError as e:
+            self._failed(addr, t0, e)
+            raise
+        self._account(addr, t0, len(buf))
+
+    def readfrom_into(self, addr, buf, stop=True):
+        t0 = time.ticks_us()
+        try:
+            self.i2c.readfrom_into(addr, buf, stop)
+        except OSError as e:
+            self._failed(addr, t0, e)
+            raise
+        self._account(addr, t0, len(buf))
+
+    def writeto(self, addr, buf, stop=True):
+        t0 = time.ticks_us()
+        try:
+            n = self.i2c.writeto(addr, buf, stop)
+        except OSError as e:
+            self._failed(addr, t0, e)
+            raise
+        self._account(addr, t0, len(buf))
+        return n
+
+    def scan(self):
+        # Probes every address, accounted in the slot of unknown addresses
+        t0 = time.ticks_us()
+        try:
+            found = self.i2c.scan()
+        except OSError as e:
+            self._failed(None, t0, e)
+            raise
+        self._account(None, t0, 0)
+        return found
+
+    def window(self):
+        """
+        Per device since the previous call: (transactions/s, bytes/s,
+        mean latency [ms], max latency [ms], NACKs, timeouts), the last two
+        are totals. The extra slot of unknown addresses comes last.
+        """
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, self._t_window) / 1000
+        self._t_window = now
+        result = []
+        for i in range(len(self.count)):
+            n = (self.count[i] - self._prev_count[i]) & 0xFFFFFFFF
+            b = (self.bytes[i] - self._prev_bytes[i]) & 0xFFFFFFFF
+            t = (self.time_us[i] - self._prev_time_us[i]) & 0xFFFFFFFF
+            self._prev_count[i] = self.count[i]
+            self._prev_bytes[i] = self.bytes[i]
+            self._prev_time_us[i] = self.time_us[i]
+            result.append((n / dt if dt > 0 else 0.0,
+                           b / dt if dt > 0 else 0.0,
+                           t / n / 1000 if n else 0.0,
+                           self.max_us[i] / 1000,
+                           self.nacks[i], self.timeouts[i]))
+            self.max_us[i] = 0
+        return result
@@ -0,0 +1,92 @@
+from array import array
+import struct
+
+class RingBuffer:
+    """
+    Preallocated ring of integer samples (array('H') by default), oldest first.
+    When full, append() overwrites the oldest sample. With track_max, max()
+    is O(1): a monotonic deque of sample numbers (4 bytes per sample)
+    tracks the maximum of the window, without it max() scans the ring.
+    Iterating doesn't copy, the chart and the storage task read the samples
+    in place.
+    """
+    def __init__(self, capacity, typecode="H", track_max=False):
+        self.capacity = capacity
+        self.typecode = typecode
+        self.data = array(typecode, [0] * capacity)
+        self.head = 0          # index of the oldest sample
+        self.length = 0
+        self.seq = 0           # number of the next sample, never wraps back
+        # Sliding maximum: sample numbers with decreasing values, front = max
+        self._dq = array("I", [0] * capacity) if track_max else None
+        self._dq_head = 0
+        self._dq_len = 0
+
+    def ram_bytes(self):
+        """Size of the preallocated samples + sliding max deque."""
+        size = struct.calcsize(self.typecode)
+        if self._dq is not None:
+            size += 4
+        return self.capacity * size
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= self.length:
+            raise IndexError("ring index out of range")
+        return self.data[(self.head + i) % self.capacity]
+
+    def __iter__(self):
+        data = self.data
+        capacity = self.capacity
+        i = self.head
+        for _ in range(self.length):
+            yield data[i]
+            i += 1
+            if i == capacity:
+                i = 0
+
+    def clear(self):
+        self.head = self.seq % self.capacity
+        self.length = 0
+        self._dq_head = 0
+        self._dq_len = 0
+
+    def append(self, value):
+        capacity = self.capacity
+        data = self.data
+        seq = self.seq
+        data[seq % capacity] = value
+        if self.length < capacity:
+            self.length += 1
+        else:
+            self.head = (self.head + 1) % capacity
+        self.seq = seq + 1
+
+        dq = self._dq
+        if dq is None:
+            return
+        # Drop the sample that just left the window
+        if self._dq_len and dq[self._dq_head] <= seq - capacity:
+            self._dq_head = (self._dq_head + 1) % capacity
+            self._dq_len -= 1
+        # Drop every smaller sample from the back, they can't be the max anymore
+        while self._dq_len and data[dq[(self._dq_head + self._dq_len - 1) % capacity] % capacity] <= value:
+            self._dq_len -= 1
+        dq[(self._dq_head + self._dq_len) % capacity] = seq
+        self._dq_len += 1
+
+    def max(self, default=0):
+        """Largest sample in the ring."""
+        if self._dq is None:
+            result = default
+            for i, v in enumerate(self):
+                if i == 0 or v > result:
+                    result = v
+            return result
+        if not self._dq_len:
+            return default
+        return self.data[self._dq[self._dq_head] % self.capacity]
@@ -0,0 +1,174 @@
+from array import array
+import time
+
+HIST_BINS = 12   # histogram bins per bucket, used for the percentiles
+
+class RollingWindow:
+    """
+    Sliding window of `buckets` sub-buckets of `bucket_s` seconds, for every
+    field: count, mean, M2 (sum of squared deviations from the mean), min,
+    max and a HIST_BINS histogram. Samples are folded into the newest bucket
+    with Welford's update and never stored, the oldest bucket is cleared when
+    the window slides. Floats are single precision on the board, sum and sum
+    of squares would cancel out the variance of e.g. CO2.
+    """
+    def __init__(self, name, bucket_s, buckets, n_fields):
+        self.name = name
+        self.bucket_ms = bucket_s * 1000
+        self.buckets = buckets
+        self.n_fields = n_fields
+        size = buckets * n_fields
+        self.count = array("H", [0] * size)
+        self.mean = array("f", [0] * size)
+        self.m2 = array("f", [0] * size)
+        self.lo = array("f", [0] * size)
+        self.hi = array("f", [0] * size)
+        self.hist = array("H", [0] * (size * HIST_BINS))
+        self.head = 0             # newest bucket
+        self.start_ms = None      # start of the newest bucket
+
+    def ram_bytes(self):
+        size = self.buckets * self.n_fields
+        return size * (2 + 4 * 4 + 2 * HIST_BINS)
+
+    def _clear_bucket(self, b):
+        n = self.n_fields
+        for i in range(b * n, (b + 1) * n):
+            self.count[i] = 0
+        for i in range(b * n * HIST_BINS, (b + 1) * n * HIST_BINS):
+            self.hist[i] = 0
+
+    def advance(self, now_ms):
+        """Slide the window to `now_ms`, clearing the buckets that expired."""
+        if self.start_ms is None:
+            self.start_ms = now_ms
+            return
+        steps = 0
+        while time.ticks_diff(now_ms, self.start_ms) >= self.bucket_ms:
+            self.start_ms = time.ticks_add(self.start_ms, self.bucket_ms)
+            # After a long pause every bucket is stale, skip the rest
+            if steps < self.buckets:
+                self.head = (self.head + 1) % self.buckets
+                self._clear_bucket(self.head)
+            steps += 1
+
+    def add(self, f, x, hbin):
+        i = self.head * self.n_fields + f
+        c = self.count[i]
+        if c == 0:
+            self.mean[i] = 0
+            self.m2[i] = 0
+            self.lo[i] = x
+            self.hi[i] = x
+        else:
+            if x < self.lo[i]:
+                self.lo[i] = x
+            if x > self.hi[i]:
+                self.hi[i] = x
+        if c < 65535:
+            c += 1
+            self.count[i] = c
+            d = x - self.mean[i]
+            self.mean[i] += d / c
+            self.m2[i] += d * (x - self.mean[i])
+            h = i * HIST_BINS + hbin
+            self.hist[h] += 1
+
+
+class RollingStats:
+    """
+    Rolling mean, variance, min/max and approximate percentiles of every
+    field over several sliding windows. `fields` is a tuple of
+    (name, lo, hi): lo..hi is the histogram range of the percentiles, values
+    outside are counted in the edge bins. `windows` is a tuple of
+    (name, bucket length [s], buckets).
+    """
+    def __init__(self, fields, windows):
+        self.fields = fields
+        self.windows = [RollingWindow(name, bucket_s, buckets, len(fields)) for name, bucket_s, buckets in windows]
+        # Per field: histogram start and bin width
+        self._lo = array("f", [lo for _, lo, _ in fields])
+        self._width = array("f", [(hi - lo) / HIST_BINS for _, lo, hi in fields])
+
+    def ram_bytes(self):
+        return sum(w.ram_bytes() for w in self.windows)
+
+    def add(self, values, now_ms=None):
+        """
+        Add one sample per field, `values` in the order of `fields`,
+        None values are skipped.
+        """
+        if now_ms is None:
+            now_ms = time.ticks_ms()
+        for w in self.windows:
+            w.advance(now_ms)
+        for f in range(len(self.fields)):
+            v = values[f]
+            if v is None:
+                continue
+            hbin = int((v - self._lo[f]) / self._width[f])
+            if hbin < 0:
+                hbin = 0
+            elif hbin >= HIST_BINS:
+                hbin = HIST_BINS - 1
+            for w in self.windows:
+                w.add(f, v, hbin)
+
+    def window_index(self, name):
+        for i, w in enumerate(self.windows):
+            if w.name == name:
+                return i
+        raise ValueError("unknown window: " + name)
+
+    def summary(self, window, field):
+        """
+        -> (count, mean, variance, min, max, p50, p95) of one field over
+        window number `window`, None if there are no samples yet.
+        """
+        w = self.windows[window]
+        n_fields = w.n_fields
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        lo = None
+        hi = None
+        hist = [0] * HIST_BINS
+        for b in range(w.buckets):
+            i = b * n_fields + field
+            c = w.count[i]
+            if c == 0:
+                continue
+            # Parallel merge of the bucket's mean and M2 (Chan et al.)
+            d = w.mean[i] - mean
+            n = count + c
+            mean += d * c / n
+            m2 += w.m2[i] + d * d * count * c / n
+            count = n
+            if lo is None or w.lo[i] < lo:
+                lo = w.lo[i]
+            if hi is None or w.hi[i] > hi:
+                hi = w.hi[i]
+            h = i * HIST_BINS
+            for k in range(HIST_BINS):
+                hist[k] += w.hist[h + k]
+        if count == 0:
+            return None
+
+        variance = m2 / count
+        if variance < 0:
+            variance = 0.0
+        return (count, mean, variance, lo, hi,
+                self._percentile(field, hist, count, 0.50, lo, hi),
+                self._percentile(field, hist, count, 0.95, lo, hi))
+
+    def _percentile(self, field, hist, count, p, lo, hi):
+        """Linear interpolation inside the histogram bin, clamped to min..max."""
+        target = p * count
+        cum = 0
+        for k in range(HIST_BINS):
+            c = hist[k]
+            if c and cum + c >= target:
+                v = self._lo[field] + (k + (target - cum) / c) * self._width[field]
+                return min(max(v, lo), hi)
+            cum += c
+        return hi
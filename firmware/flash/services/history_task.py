@@ -1,76 +1,98 @@
 import uasyncio as asyncio
 import time
 from logger import Logger
+from clock_window import rtc_seconds
 
 # ---- Global variables ----
 import shared_variables as var
 
+# Value range of the ring typecodes, averages are clamped into it
+TYPE_LIMITS = {
+    "h": (-32768, 32767),
+    "H": (0, 65535),
+    "I": (0, 0xFFFFFFFF),
+}
+
+def _fixed(value, scale, typecode):
+    """Reading -> fixed-point sample of a history channel."""
+    lo, hi = TYPE_LIMITS[typecode]
+    v = int(round(value * scale))
+    if v < lo:
+        return lo
+    if v > hi:
+        return hi
+    return v
+
 async def history_task(period=1.0):
     # Init
     log = Logger("hist", debug_enabled=False)
 
-    # 5 minutes window in ms
-    WINDOW_MS = 5 * 60 * 1000
+    channels = var.HISTORY_CHANNELS
+    tiers = var.history_tiers
+
+    # RTC aligned windows: every tier takes the records of the window with
+    # its sample period, the storage task logs the one of its interval
+    clock = var.clock_window
+    tier_levels = [clock.level(period) for _, period, _ in var.HISTORY_TIERS]
+    channel_fields = [var.AGGREGATE_FIELDS.index(attr) for _, attr, _, _ in channels]
+    values = [None] * len(var.AGGREGATE_FIELDS)
 
-    # Accumulators for 5-minute average
-    acc_sum = 0
-    acc_count = 0
-    window_start = time.ticks_ms()
+    # RAM is bounded: every ring is preallocated at import
+    for name, _, _, _ in channels:
+        var.system_data.history_ram[name] = sum(tier[name].ram_bytes() for tier in tiers)
+    log.info("History RAM per channel:", var.system_data.history_ram)
+
+    # Rolling statistics input, reused every cycle
+    stats_fields = var.STATS_FIELDS
+    stats_values = [None] * len(stats_fields)
+    var.system_data.stats_ram = var.rolling_stats.ram_bytes()
+    log.info("Rolling statistics RAM:", var.system_data.stats_ram)
 
     # Run
     while True:
-        # --- sample current CO2 value ---
-        value = var.sensor_data.co2_scd41
+        # --- rolling statistics of every field ---
+        for i in range(len(stats_fields)):
+            stats_values[i] = getattr(var.sensor_data, stats_fields[i][0])
+        var.rolling_stats.add(stats_values)
 
-        # ignore None values, only accumulate real readings
+        value = var.sensor_data.co2_scd41
         if value is not None:
-            acc_sum += value
-            acc_count += 1
-            
             if var.scd41_co2_detected == 0 and value > var.scd41_co2_threshold:
                 var.scd41_co2_detected = 1
-            
+
             if var.scd41_co2_detected == 1 and value < var.scd41_co2_threshold - 50: # 50ppm hysteresis
                 var.scd41_co2_detected = 0
 
-        # --- update the live last element ---
-        # last element must always represent current reading
-        var.scd41_co2_history[-1] = value if value is not None else 0
-
-        # check if 5 minutes passed
-        now = time.ticks_ms()
-        if time.ticks_diff(now, window_start) >= WINDOW_MS:
-            if acc_count > 0:
-                avg = acc_sum // acc_count   # integer average
-            else:
-                # no valid samples in this window → store 0
-                avg = 0
-
-            var.scd41_co2_history.pop() # remove the last item which is always the current value
-            var.scd41_co2_history.append(avg)
-            var.scd41_co2_history.append(avg) # append 2nd time so this will be overwritten by current value
-
-            # trim old items if longer than allowed
-            if len(var.scd41_co2_history) > var.CO2_HISTORY_MAX:
-                overflow = len(var.scd41_co2_history) - var.CO2_HISTORY_MAX
-                del var.scd41_co2_history[0:overflow]
-
-            log.debug("Added CO2 history item:", avg,
-                      "len:", len(var.scd41_co2_history))
-
-            # reset window
-            window_start = now
-            acc_sum = 0
-            acc_count = 0
-            
-            var.scd41_co2_peak_ppm = max(var.scd41_co2_history)
-            
+        # --- feed the RTC aligned windows, collect the closed ones ---
+        now = rtc_seconds(var.system_data.time_rtc)
+        if now is not None:
+            for i in range(len(values)):
+                values[i] = getattr(var.sensor_data, var.AGGREGATE_FIELDS[i])
+            closed = clock.add(now, values)
+
+            for k in range(len(tiers)):
+                level = tier_levels[k]
+                if not closed & (1 << level):
+                    continue
+                record = clock.record[level]
+                for i in range(len(channels)):
+                    name, _, typecode, scale = channels[i]
+                    avg = record[channel_fields[i]]
+                    # no valid samples in this window → store 0
+                    avg = _fixed(avg, scale, typecode) if avg is not None else 0
+                    # fixed size ring, the oldest average is overwritten when full
+                    tiers[k][name].append(avg)
+
+            if closed:
+                log.debug("Added history items, len:", [len(tier["co2"]) for tier in tiers])
+                var.scd41_co2_peak_ppm = var.scd41_co2_history.max()
+
         # storage task recovered the last 24 hours log, check the peak
         if var.history_loaded:
-            var.scd41_co2_peak_ppm = max(var.scd41_co2_history)
+            var.scd41_co2_peak_ppm = var.scd41_co2_history.max()
             log.info("History recovered, updating peak CO2")
             var.history_loaded = False # We don't need this flag anymore
 
         var.system_data.history_task_timestamp = time.time()
 
-        await asyncio.sleep(period)
\ No newline at end of file
+        await asyncio.sleep(period)
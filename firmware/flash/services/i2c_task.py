@@ -1,7 +1,9 @@
 import uasyncio as asyncio
 import time
+import errno
 from machine import Pin, I2C, RTC
 from logger import Logger
+from i2c_bus import I2CBus, InstrumentedI2C, PRIO_HIGH, PRIO_NORMAL, PRIO_LOW
 from drivers import veml7700 as veml7700_driver
 from drivers import ens160 as ens160_driver
 from drivers import ahtx0 as athx0_driver
@@ -49,12 +51,246 @@ def is_time_diff_over_threshold(ntp_time, rtc_time, threshold_seconds=60):
         log.warning("Failed to compare times:", ntp_time, rtc_time, "| Error:", e)
         return False
 
+# ---- Per-device schedules ----
+# Every device has its own coroutine and period (i2c_period_* in
+# shared_variables), they share I2C(1) through the `bus` arbiter
+# (var.i2c_bus): LED high priority, RTC normal, sensor reads and scans low.
+
+def _led_color(co2):
+    if co2 == None:
+        return "off"
+    elif co2 < 1000:
+        return "green"
+    elif co2 < 1500:
+        return "yellow"
+    else:
+        return "red"
+
+# ---- Device presence ----
+# Presence follows the real transactions: a successful one sets the device's
+# bit in system_data.i2c_present, one the device didn't answer clears it and
+# asks for an early rescan. A full bus scan only runs in the background.
+
+_DEVICE_BIT = {name: 1 << i for i, (name, _) in enumerate(var.I2C_DEVICES)}
+_rescan = asyncio.Event()
+
+def _set_present(name, ok, rescan=True):
+    bit = _DEVICE_BIT[name]
+    data = var.system_data
+    present = data.i2c_present | bit if ok else data.i2c_present & ~bit
+    if present != data.i2c_present or not data.i2c_checked & bit:
+        data.i2c_present = present
+        data.i2c_checked |= bit
+        data.i2c_status_version += 1
+    if not ok and rescan:
+        _rescan.set()
+
+# Transaction errors that mean the device didn't answer (NACK, timeout).
+# Anything else, e.g. a CRC error of a device that answered, is a failed
+# read of a present device.
+_BUS_ERRNOS = (errno.EIO, errno.ENODEV, errno.ETIMEDOUT)
+
+def _device_failed(name, e):
+    """A device transaction raised `e`: clear its presence on bus errors only."""
+    if isinstance(e, OSError) and e.args and e.args[0] in _BUS_ERRNOS:
+        _set_present(name, False)
+
+async def _scan_loop(bus, i2c1):
+    while True:
+        try:
+            async with bus.hold(PRIO_LOW):
+                devices = i2c1.scan()
+            var.system_data.i2c_devices = devices
+
+            for name, address in var.I2C_DEVICES:
+                _set_present(name, address in devices, rescan=False)
+            known = [address for _, address in var.I2C_DEVICES]
+            unknown = [address for address in devices if address not in known]
+            if unknown != var.system_data.i2c_status_unknown:
+                var.system_data.i2c_status_unknown = unknown
+                var.system_data.i2c_status_version += 1
+            log.debug("Scan result:", devices)
+        except Exception as e:
+            log.error("I2C scan failed:", e)
+
+        # Next scan after i2c_period_scan, or sooner if a transaction failed
+        await asyncio.sleep(var.i2c_rescan_min_s)
+        _rescan.clear()
+        try:
+            await asyncio.wait_for(_rescan.wait(), var.i2c_period_scan - var.i2c_rescan_min_s)
+        except asyncio.TimeoutError:
+            pass
+        _rescan.clear()
+
+async def _veml7700_loop(bus, veml7700_sensor):
+    while True:
+        try:
+            async with bus.hold(PRIO_LOW):
+                lux = await veml7700_sensor.read_async()
+            _set_present("VEML7700", True)
+            log.debug("[VEML7700] Lux", lux)
+            var.sensor_data.lux_veml7700 = lux if lux is not None else 0
+        except Exception as e:
+            _device_failed("VEML7700", e)
+            log.error("[VEML7700] read failed:", e)
+        await asyncio.sleep(var.i2c_period_veml7700)
+
+async def _aht21_loop(bus, aht21_sensor):
+    while True:
+        try:
+            # One conversion for both values, the bus is free while it runs
+            async with bus.hold(PRIO_LOW):
+                aht21_sensor.start_measurement()
+            await asyncio.sleep_ms(aht21_sensor.AHTX0_MEASUREMENT_MS)
+            for _ in range(20):
+                async with bus.hold(PRIO_LOW):
+                    result = aht21_sensor.read_measurement()
+                if result is not None:
+                    break
+                await asyncio.sleep_ms(5)
+            else:
+                raise RuntimeError("AHT21 conversion timeout")
+            temp, rh = result
+            temp += var.aht21_temp_offset
+            _set_present("AHT21", True)
+            log.debug("[AHT21] temperature:", temp)
+            log.debug("[AHT21] humidity:", rh)
+            var.sensor_data.temp_aht21 = temp if temp is not None else 0
+            var.sensor_data.humidity_aht21 = rh if rh is not None else 0
+        except Exception as e:
+            _device_failed("AHT21", e)
+            log.error("[AHT21] read failed:", e)
+        await asyncio.sleep(var.i2c_period_aht21)
+
+async def _ens160_loop(bus, ens160_sensor):
+    while True:
+        try:
+            async with bus.hold(PRIO_LOW):
+                aqi, tvoc, eco2, temp, rh, eco2_rating, tvoc_rating = await ens160_sensor.read_async()
+            _set_present("ENS160", True)
+
+            #log.debug("[ENS160] temperature:", temp)
+            #log.debug("[ENS160] humidity:", rh)
+            log.debug("[ENS160] AQI:", aqi)
+            log.debug("[ENS160] TVOC:", tvoc, "-", tvoc_rating)
+            log.debug("[ENS160] eCO2:", eco2, "-", eco2_rating)
+            
+            #var.sensor_data.temp_ens160 = temp if temp is not None else 0
+            #var.sensor_data.humidity_ens160 = rh if rh is not None else 0
+            var.sensor_data.aqi_ens160 = aqi if aqi is not None else 0
+            var.sensor_data.tvoc_ens160 = tvoc if tvoc is not None else 0
+            var.sensor_data.tvoc_rating_ens160 = tvoc_rating if tvoc_rating is not None else "N/A"
+            var.sensor_data.eco2_ens160 = eco2 if eco2 is not None else 0
+            var.sensor_data.eco2_rating_ens160 = eco2_rating if eco2_rating is not None else "N/A"
+        except Exception as e:
+            _device_failed("ENS160", e)
+            log.error("[ENS160] read failed:", e)
+        await asyncio.sleep(var.i2c_period_ens160)
+
+async def _scd41_loop(bus, scd4x):
+    while True:
+        try:
+            # The bus is only held per transfer, not while the command executes
+            async with bus.hold(PRIO_LOW):
+                scd4x.request_data_ready()
+            await asyncio.sleep_ms(scd4x.CMD_DELAY_MS)
+            async with bus.hold(PRIO_LOW):
+                fresh = scd4x.read_data_ready()
+            if fresh:
+                async with bus.hold(PRIO_LOW):
+                    scd4x.request_measurement()
+                await asyncio.sleep_ms(scd4x.CMD_DELAY_MS)
+                async with bus.hold(PRIO_LOW):
+                    co2, temp, rh, _ = scd4x.read_measurement_reply()
+            _set_present("SCD41", True)
+            # Between measurements the last reading is kept
+            if fresh:
+                log.debug("[SCD41] CO2:", co2)
+                log.debug("[SCD41] temperature:", temp)
+                log.debug("[SCD41] humidity:", rh)
+                var.sensor_data.co2_scd41 = co2 if co2 is not None else 0
+                var.sensor_data.temp_scd41 = temp if temp is not None else 0
+                var.sensor_data.humidity_scd41 = rh if rh is not None else 0
+
+                var.system_data.feedback_led = _led_color(co2)
+        except Exception as e:
+            _device_failed("SCD41", e)
+            log.error("[SCD41] read failed:", e)
+        await asyncio.sleep(var.i2c_period_scd41)
+
+async def _ds3231_loop(bus, ds3231):
+    while True:
+        try:
+            async with bus.hold(PRIO_NORMAL):
+                var.system_data.time_rtc = ds3231.datetime()
+            _set_present("DS3231", True)
+            log.debug("[DS3231] RTC datetime:", var.system_data.time_rtc)
+            
+            if is_time_diff_over_threshold(var.system_data.time_ntp, var.system_data.time_rtc, 60):
+                log.warning("[DS3231] RTC time needs to be updated from NTP time!", var.system_data.time_ntp)
+                async with bus.hold(PRIO_NORMAL):
+                    ds3231.datetime(var.system_data.time_ntp)
+        except Exception as e:
+            _device_failed("DS3231", e)
+            log.error("[DS3231] read failed:", e)
+        await asyncio.sleep(var.i2c_period_ds3231)
+
+async def _bmp280_loop(bus, bmp280):
+    while True:
+        try:
+            if bmp280.in_forced_mode:
+                # Trigger a conversion, the bus is free while it runs
+                async with bus.hold(PRIO_LOW):
+                    bmp280.force_measure()
+                await asyncio.sleep_ms(bmp280.read_wait_ms)
+            async with bus.hold(PRIO_LOW):
+                temp, pressure = bmp280.read()
+            _set_present("BMP280", True)
+            log.debug("[BMP280] pressure:", pressure)
+            log.debug("[BMP280] temperature:", temp)
+            var.sensor_data.pressure_bmp280 = pressure if pressure is not None else 0
+            var.sensor_data.temp_bmp280 = temp if temp is not None else 0
+        except Exception as e:
+            _device_failed("BMP280", e)
+            log.error("[BMP280] read failed:", e)
+        await asyncio.sleep(var.i2c_period_bmp280)
+
+async def _led_loop(bus, pca9685):
+    # The PCA9685 is only written when the color changes
+    led = None
+    while True:
+        if var.system_data.feedback_led != led:
+            led = var.system_data.feedback_led
+            if led == "green":
+                duty = (0, 4000, 0)
+            elif led == "yellow":
+                duty = (0, 1000, 4000)
+            elif led == "red":
+                duty = (0, 0, 4000)
+            elif led == "blue":
+                duty = (4000, 0, 0)
+            elif led == "off":
+                duty = (0, 0, 0)
+            else: # Default white
+                duty = (1000, 1000, 1000)
+            try:
+                async with bus.hold(PRIO_HIGH):
+                    pca9685.duty(0, duty[0])
+                    pca9685.duty(1, duty[1])
+                    pca9685.duty(2, duty[2])
+                _set_present("PCA9685", True)
+            except Exception as e:
+                _device_failed("PCA9685", e)
+                log.error("[PCA9685] write failed:", e)
+                led = None  # retry next time
+        await asyncio.sleep(var.i2c_period_led)
+
 async def i2c_task(period = 1.0):
     #Init
     
     # I2C1 uses PB8=D15 (SCL) / PB9=D14 (SDA) on STM32F746 builds
-    i2c1=I2C(1, freq=100000)
-    log.info("Scan result:", i2c1.scan())
+    # Every transaction is counted and timed per device address
+    i2c1 = InstrumentedI2C(I2C(1, freq=100000), [address for _, address in var.I2C_DEVICES])
     
     # Initialize the VEML7700 Lux sensor
     veml7700_sensor = veml7700_driver.VEML7700(address=0x10, i2c=i2c1, it=400, gain=1/8)
@@ -62,11 +298,13 @@ async def i2c_task(period = 1.0):
     # Initialize the ENS160 AQI sensor
     ens160_sensor = ens160_driver.ENS160(i2c1)
     # Initialize the AHT21 temperature sensor
-    aht21_sensor = athx0_driver.AHT20(i2c1)
+    aht21_sensor = athx0_driver.AHT20(i2c1, init=False)
 
-    # Initialize the DS3231 RTC
+    # Initialize the DS3231 RTC, before the first await: the storage task
+    # waits for time_rtc to open today's log segment
     ds3231 = ds3231_driver.DS3231(i2c1)
     rtc_datetime = ds3231.datetime()
+    var.system_data.time_rtc = rtc_datetime
     log.info("[DS3231] RTC datetime at init:", rtc_datetime)
     
     # Initialize MCU's RTC HW
@@ -74,6 +312,8 @@ async def i2c_task(period = 1.0):
     rtc_mcu.datetime(rtc_datetime)
     log.info("MCU RTC was initialized to:", time.localtime())
 
+    await aht21_sensor.init_async()
+
     # Initialize the BMP280 Pressure sensor
     bmp280 = bmp280_driver.BMP280(i2c1)
     bmp280.use_case(bmp280_driver.BMP280_CASE_INDOOR)
@@ -85,14 +325,15 @@ async def i2c_task(period = 1.0):
     bmp280.power_mode = bmp280_driver.BMP280_POWER_NORMAL
     #bmp280.normal_measure()
     #bmp280.in_normal_mode()
-    time.sleep(0.1)
+    await asyncio.sleep_ms(100)
     init_pressure = bmp280.pressure
     
     # Initialize the SCD4X CO2 sensor
-    scd4x = scd4x_driver.SCD4X(i2c1)
+    scd4x = scd4x_driver.SCD4X(i2c1, stop=False)
+    await scd4x.stop()
     scd4x.set_ambient_pressure(init_pressure)
     log.info("[SCD41] pressure initialized to", init_pressure, "hPa")
-    scd4x.start_periodic_measurement()
+    await scd4x.start()
     
     # Initialize PCA9685 PWM driver
     pca9685 = pca9685_driver.PCA9685(i2c1)
@@ -108,162 +349,30 @@ async def i2c_task(period = 1.0):
     #drv2605.stop()
 
     #Run
-    while True:
-        
-        devices = i2c1.scan()
-        var.system_data.i2c_devices = devices
-        
-        # AHT21
-        try:
-            idx = devices.index(0x38)
-            devices.pop(idx)
-            var.system_data.i2c_status_aht21 = "AHT21 is online at 0x38"
-        except:
-            var.system_data.i2c_status_aht21 = "AHT21 is NOT found at 0x38"
-
-        # BMP280
-        try:
-            idx = devices.index(0x76)
-            devices.pop(idx)
-            var.system_data.i2c_status_bmp280 = "BMP280 is online at 0x76"
-        except:
-            var.system_data.i2c_status_bmp280 = "BMP280 is NOT found at 0x76"
-        
-        # DS3231
-        try:
-            idx = devices.index(0x68)
-            devices.pop(idx)
-            var.system_data.i2c_status_ds3231 = "DS3231 is online at 0x68"
-        except:
-            var.system_data.i2c_status_ds3231 = "DS3231 is NOT found at 0x68"
-        
-        # ENS160
-        try:
-            idx = devices.index(0x53)
-            devices.pop(idx)
-            var.system_data.i2c_status_ens160 = "ENS160 is online at 0x53"
-        except:
-            var.system_data.i2c_status_ens160 = "ENS160 is NOT found at 0x53"
-        
-        # SCD41
-        try:
-            idx = devices.index(0x62)
-            devices.pop(idx)
-            var.system_data.i2c_status_scd41 = "SCD41 is online at 0x62"
-        except:
-            var.system_data.i2c_status_scd41 = "SCD41 is NOT found at 0x62"
-        
-        # VEML7700
-        try:
-            idx = devices.index(0x10)
-            devices.pop(idx)
-            var.system_data.i2c_status_veml7700 = "VEML7700 is online at 0x10"
-        except:
-            var.system_data.i2c_status_veml7700 = "VEML7700 is NOT found at 0x10"
+    # One arbiter for the shared I2C(1) bus, every device runs on its own schedule
+    bus = I2CBus(i2c1)
+    var.i2c_bus = bus
+    asyncio.create_task(_scan_loop(bus, i2c1))
+    asyncio.create_task(_veml7700_loop(bus, veml7700_sensor))
+    asyncio.create_task(_aht21_loop(bus, aht21_sensor))
+    asyncio.create_task(_ens160_loop(bus, ens160_sensor))
+    asyncio.create_task(_scd41_loop(bus, scd4x))
+    asyncio.create_task(_ds3231_loop(bus, ds3231))
+    asyncio.create_task(_bmp280_loop(bus, bmp280))
+    asyncio.create_task(_led_loop(bus, pca9685))
 
-        # DRV2605
-        try:
-            idx = devices.index(0x5A)
-            devices.pop(idx)
-            var.system_data.i2c_status_drv2605 = "DRV2605 is online at 0x5A"
-        except:
-            var.system_data.i2c_status_drv2605 = "DRV2605 is NOT found at 0x5A"
-
-        # PCA9685
-        try:
-            idx = devices.index(0x40)
-            devices.pop(idx)
-            var.system_data.i2c_status_pca9685 = "PCA9685 is online at 0x40"
-        except:
-            var.system_data.i2c_status_pca9685 = "PCA9685 is NOT found at 0x40"
-            
-        var.system_data.i2c_status_unknown = devices
-
-        lux = veml7700_sensor.read_lux()
-        log.debug("[VEML7700] Lux", lux)
-        var.sensor_data.lux_veml7700 = lux if lux is not None else 0
-        
-        temp = aht21_sensor.temperature + var.aht21_temp_offset
-        rh = aht21_sensor.relative_humidity
-        log.debug("[AHT21] temperature:", temp)
-        log.debug("[AHT21] humidity:", rh)
-        var.sensor_data.temp_aht21 = temp if temp is not None else 0
-        var.sensor_data.humidity_aht21 = rh if rh is not None else 0
-        
-        aqi, tvoc, eco2, temp, rh, eco2_rating, tvoc_rating = ens160_sensor.read_air_quality()
-
-        #log.debug("[ENS160] temperature:", temp)
-        #log.debug("[ENS160] humidity:", rh)
-        log.debug("[ENS160] AQI:", aqi)
-        log.debug("[ENS160] TVOC:", tvoc, "-", tvoc_rating)
-        log.debug("[ENS160] eCO2:", eco2, "-", eco2_rating)
-        
-        #var.sensor_data.temp_ens160 = temp if temp is not None else 0
-        #var.sensor_data.humidity_ens160 = rh if rh is not None else 0
-        var.sensor_data.aqi_ens160 = aqi if aqi is not None else 0
-        var.sensor_data.tvoc_ens160 = tvoc if tvoc is not None else 0
-        var.sensor_data.tvoc_rating_ens160 = tvoc_rating if tvoc_rating is not None else "N/A"
-        var.sensor_data.eco2_ens160 = eco2 if eco2 is not None else 0
-        var.sensor_data.eco2_rating_ens160 = eco2_rating if eco2_rating is not None else "N/A"
-        
-        co2 = scd4x.co2
-        temp = scd4x.temperature
-        rh = scd4x.relative_humidity
-        log.debug("[SCD41] CO2:", co2)
-        log.debug("[SCD41] temperature:", temp)
-        log.debug("[SCD41] humidity:", rh)
-        var.sensor_data.co2_scd41 = co2 if co2 is not None else 0
-        var.sensor_data.temp_scd41 = temp if temp is not None else 0
-        var.sensor_data.humidity_scd41 = rh if rh is not None else 0
-        
-        if co2 == None:
-            var.system_data.feedback_led = "off"
-        elif co2 < 1000:
-            var.system_data.feedback_led = "green"
-        elif co2 < 1500:
-            var.system_data.feedback_led = "yellow"
-        else:
-            var.system_data.feedback_led = "red"
-        
-        var.system_data.time_rtc = ds3231.datetime()
-        log.debug("[DS3231] RTC datetime:", var.system_data.time_rtc)
-        
-        if is_time_diff_over_threshold(var.system_data.time_ntp, var.system_data.time_rtc, 60):
-            log.warning("[DS3231] RTC time needs to be updated from NTP time!", var.system_data.time_ntp)
-            ds3231.datetime(var.system_data.time_ntp)
-        
-        pressure = bmp280.pressure
-        temp = bmp280.temperature
-        log.debug("[BMP280] pressure:", pressure)
-        log.debug("[BMP280] temperature:", temp)
-        var.sensor_data.pressure_bmp280 = pressure if pressure is not None else 0
-        var.sensor_data.temp_bmp280 = temp if temp is not None else 0
-        
-        if var.system_data.feedback_led == "green":
-            pca9685.duty(0, 0)
-            pca9685.duty(1, 4000)
-            pca9685.duty(2, 0)
-        elif var.system_data.feedback_led == "yellow":
-            pca9685.duty(0, 0)
-            pca9685.duty(1, 1000)
-            pca9685.duty(2, 4000)
-        elif var.system_data.feedback_led == "red":
-            pca9685.duty(0, 0)
-            pca9685.duty(1, 0)
-            pca9685.duty(2, 4000)
-        elif var.system_data.feedback_led == "blue":
-            pca9685.duty(0, 4000)
-            pca9685.duty(1, 0)
-            pca9685.duty(2, 0)
-        elif var.system_data.feedback_led == "off":
-            pca9685.duty(0, 0)
-            pca9685.duty(1, 0)
-            pca9685.duty(2, 0)
-        else: # Default white
-            pca9685.duty(0, 1000)
-            pca9685.duty(1, 1000)
-            pca9685.duty(2, 1000)
-        
+    stats_ts = time.ticks_ms()
+    i2c1.window()
+    while True:
         var.system_data.i2c_task_timestamp = time.time()
+        # Bus load and deepest queue over the same window as the device stats,
+        # utilisation() starts a new window
+        if time.ticks_diff(time.ticks_ms(), stats_ts) >= var.i2c_stats_period_s * 1000:
+            stats_ts = time.ticks_ms()
+            var.system_data.i2c_stats = i2c1.window()
+            var.system_data.i2c_queue_max = bus.max_depth
+            var.system_data.i2c_bus_util = bus.utilisation() * 100
+            var.system_data.i2c_status_version += 1
+        var.system_data.i2c_queue_depth = bus.depth()
         
         await asyncio.sleep(period)
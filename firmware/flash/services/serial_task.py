@@ -70,6 +70,13 @@ async def serial_task(period = 1.0):
     #Init
     uart6 = UART(6, baudrate=115200, bits=8, parity=None, stop=1, timeout=1000)
 
+    # Rolling statistics go out one field/window pair per cycle
+    stats = var.rolling_stats
+    stats_n = len(var.STATS_FIELDS) * len(stats.windows)
+    stats_i = 0
+    # I2C transaction statistics go out one device per cycle
+    i2c_i = 0
+
     #Run
     while True:
         
@@ -110,6 +117,32 @@ async def serial_task(period = 1.0):
         #if error is not None:
         #    log.warning(error)
         uart6.write(b'LUX:' + str(var.sensor_data.lux_veml7700) + '\n')
+        # SD health: bytes written, recoveries, errors, worst loop stall [ms], worst write [ms], write latency histogram
+        sd = var.system_data
+        uart6.write("SD:{},{},{},{:.0f},{:.0f},{}\n".format(
+            sd.sd_bytes_written,
+            sd.sd_recovery_count,
+            sum(sd.sd_errors.values()),
+            sd.storage_max_stall_ms,
+            sd.sd_latency_max_ms["write"],
+            "/".join(str(n) for n in sd.sd_latency_hist["write"])))
+
+        # Rolling statistics: field, window, count, mean, std, min, max, P50, P95
+        field, window = divmod(stats_i, len(stats.windows))
+        stats_i = (stats_i + 1) % stats_n
+        s = stats.summary(window, field)
+        if s is not None:
+            uart6.write("STATS:{},{},{},{:.2f},{:.2f},{:.2f},{:.2f},{:.2f},{:.2f}\n".format(
+                var.STATS_FIELDS[field][0], stats.windows[window].name,
+                s[0], s[1], s[2] ** 0.5, s[3], s[4], s[5], s[6]))
+
+        # I2C device: name, transactions/s, bytes/s, mean latency [ms], max latency [ms], NACKs, timeouts
+        i2c_stats = var.system_data.i2c_stats
+        if i2c_i < len(i2c_stats) and i2c_i < len(var.I2C_DEVICES):
+            tps, bps, mean_ms, max_ms, nacks, timeouts = i2c_stats[i2c_i]
+            uart6.write("I2C:{},{:.2f},{:.0f},{:.2f},{:.2f},{},{}\n".format(
+                var.I2C_DEVICES[i2c_i][0], tps, bps, mean_ms, max_ms, nacks, timeouts))
+        i2c_i = (i2c_i + 1) % len(var.I2C_DEVICES)
         #error = uart6.readline()
         #if error is not None:
         #    log.warning(error)
@@ -3,6 +3,10 @@ import os
 import pyb
 from logger import Logger
 import time
+import struct
+import binascii
+import errno
+from array import array
 
 # ---- Global variables ----
 import shared_variables as var
@@ -10,37 +14,222 @@ import shared_variables as var
 
 log = Logger("stor", debug_enabled=False)
 
-CSV_HEADER = "timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux\n"
+# ---- Binary log format ----
+# Every day segment starts with a header padded to one record, so data record N
+# is at offset (N + 1) * RECORD_SIZE. Record fields (little endian):
+#   I  timestamp    seconds since 2000-01-01 (MicroPython epoch, RTC local time)
+#   h  temperature  0.01 °C
+#   H  humidity     0.01 %
+#   H  co2          ppm
+#   H  eco2         ppm
+#   H  tvoc         ppb
+#   B  aqi
+#   B  reserved, always 0
+#   I  pressure     0.01 hPa
+#   I  lux          0.01 lux
+#   H  crc          low 16 bits of the CRC-32 of the fields above
+#   H  commit       RECORD_COMMIT, last bytes of the record to hit the card
+# A record with a bad CRC or commit marker is a torn write: readers skip it.
+# firmware/tools/sensor_log_to_csv.py converts segments back to the old CSV format.
+RECORD_FMT = "<IhHHHHBBIIHH"
+RECORD_SIZE = struct.calcsize(RECORD_FMT) # 28 bytes
+RECORD_DATA_SIZE = RECORD_SIZE - 4        # bytes covered by the CRC
+RECORD_COMMIT = 0xA55A
+LOG_MAGIC = b"CO2L"
+LOG_VERSION = 2
+LOG_HEADER = LOG_MAGIC + bytes([LOG_VERSION, RECORD_SIZE]) + bytes(RECORD_SIZE - 6)
+LOG_EXT = ".bin"
+BAD_EXT = ".bad"   # segments with an unknown header, see _ensure_log_file()
+TMP_EXT = ".tmp"
+# Version 1 segments (24 byte records, no CRC) are converted to the current
+# format at boot / in the background, see _convert_v1_segment()
+RECORD_FMT_V1 = "<IhHHHHBBII"
+RECORD_SIZE_V1 = struct.calcsize(RECORD_FMT_V1)  # 24 bytes
+
+# ---- Sidecar time index ----
+# One .idx file next to every segment: 24 little endian uint32 entries,
+# entry H is the number of the first record logged in hour H of that day,
+# or INDEX_NO_ENTRY if there is none (yet).
+INDEX_EXT = ".idx"
+INDEX_HOURS = 24
+INDEX_SIZE = INDEX_HOURS * 4
+INDEX_NO_ENTRY = 0xFFFFFFFF
+
+# ---- Rollup tiers ----
+# 1 hour and 1 day min/max/mean of the logged fields, updated as records are
+# flushed and kept forever (~1.6 kB per day for the hourly tier). One file
+# per tier in the log directory, header padded to one record like the
+# segments. Record fields (little endian):
+#   I         window start  seconds since 2000-01-01, multiple of the tier length
+#   H         count         log records in the window
+#   hHHHHBII  min of temperature, humidity, co2, eco2, tvoc, aqi, pressure, lux
+#   hHHHHBII  max, same order and units as the log record
+#   hHHHHBII  mean, same order and units as the log record
+#   H H       crc, commit   like the log record
+ROLLUP_FIELDS = "hHHHHBII"
+ROLLUP_METRICS = len(ROLLUP_FIELDS)
+ROLLUP_FMT = "<IH" + ROLLUP_FIELDS * 3 + "HH"
+ROLLUP_SIZE = struct.calcsize(ROLLUP_FMT)  # 67 bytes
+ROLLUP_MAGIC = b"CO2R"
+ROLLUP_VERSION = 1
+ROLLUP_HEADER = ROLLUP_MAGIC + bytes([ROLLUP_VERSION, ROLLUP_SIZE]) + bytes(ROLLUP_SIZE - 6)
+ROLLUP_EXT = ".rlp"
+ROLLUP_TIERS = (("1h", 3600), ("1d", 86400))
+# Position of the rolled up fields in struct.unpack(RECORD_FMT, ...) and their scale
+_METRIC_FIELDS = (1, 2, 3, 4, 5, 6, 8, 9)
+_METRIC_SCALES = (100, 100, 1, 1, 1, 1, 100, 100)
+# History channel (shared_variables.HISTORY_CHANNELS) -> position in struct.unpack(RECORD_FMT, ...)
+_HISTORY_FIELDS = {"temp": 1, "humidity": 2, "co2": 3, "eco2": 4, "tvoc": 5, "pressure": 8, "lux": 9}
+
+# ---- Chunked SD I/O ----
+# Large reads and writes are split into IO_CHUNK byte pieces with a loop turn
+# in between, so the other tasks keep running while the SD card is busy.
+# Every synchronous SD call is timed on its own, the longest one is reported
+# as the worst loop stall.
+IO_CHUNK = 512
+RECORD_CHUNK = IO_CHUNK // RECORD_SIZE * RECORD_SIZE  # whole records per log write
+
+def _stall(t0):
+    """Record the synchronous section started at t0 as loop stall, -> its length [ms]."""
+    ms = time.ticks_diff(time.ticks_us(), t0) / 1000
+    if ms > var.system_data.storage_max_stall_ms:
+        var.system_data.storage_max_stall_ms = ms
+    return ms
+
+async def _io_sleep(seconds=0):
+    """Give the loop back between two I/O chunks."""
+    await asyncio.sleep(seconds)
+
+# ---- SD card instrumentation ----
+# Every open, write, rename, remove and statvfs goes through _sd_call(), which
+# keeps a latency histogram, the worst latency and the error count per
+# operation in var.system_data (see SD_OPS / SD_LATENCY_BUCKETS_MS).
+
+def _sd_account(op, t0, ok):
+    ms = _stall(t0)
+    data = var.system_data
+    i = 0
+    for bound in var.SD_LATENCY_BUCKETS_MS:
+        if ms < bound:
+            break
+        i += 1
+    data.sd_latency_hist[op][i] += 1
+    if ms > data.sd_latency_max_ms[op]:
+        data.sd_latency_max_ms[op] = ms
+    if not ok:
+        data.sd_errors[op] += 1
+
+def _sd_call(op, fn, *args):
+    t0 = time.ticks_us()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        # A missing file is an answer, not a card problem
+        _sd_account(op, t0, isinstance(e, OSError) and e.args[0] == errno.ENOENT)
+        raise
+    _sd_account(op, t0, True)
+    return result
+
+def _sd_open(path, mode):
+    return _sd_call("open", open, path, mode)
+
+def _sd_write(f, data):
+    n = _sd_call("write", f.write, data)
+    var.system_data.sd_bytes_written += len(data)
+    return n
+
+def _sd_read(f, buf):
+    """f.readinto(buf), only timed as loop stall (reads have no latency histogram)."""
+    t0 = time.ticks_us()
+    try:
+        return f.readinto(buf)
+    finally:
+        _stall(t0)
 
 # ---- Helpers ----
 
-def _format_timestamp(t):
+def _safe(value, default=0):
+    """Replace None with default so formatting doesn't crash."""
+    return value if value is not None else default
+
+def _fixed(value, scale, lo, hi):
+    """Scale a reading to a clamped fixed-point integer for the log record."""
+    v = int(round(_safe(value) * scale))
+    if v < lo:
+        return lo
+    if v > hi:
+        return hi
+    return v
+
+def _pack_record(buf, ts, values):
     """
-    t: (year, month, day, weekday, hour, minute, second, subsecond)
-    returns: 'YYYY-MM-DD HH:MM:SS'
+    Pack one aggregate record of the RTC aligned window starting at `ts`
+    into `buf` (a RowBuffer slot). `values` are the window means in the
+    order of var.AGGREGATE_FIELDS, which is the order of the record fields.
     """
-    y, mo, d, _, hh, mm, ss, _ = t
-    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(
-        y, mo, d, hh, mm, ss
+    temp, hum, co2, eco2, tvoc, aqi, pressure, lux = values
+    struct.pack_into(RECORD_FMT, buf, 0,
+        ts,
+        _fixed(temp, 100, -32768, 32767),
+        _fixed(hum, 100, 0, 65535),
+        _fixed(co2, 1, 0, 65535),
+        _fixed(eco2, 1, 0, 65535),
+        _fixed(tvoc, 1, 0, 65535),
+        _fixed(aqi, 1, 0, 255),
+        0,
+        _fixed(pressure, 100, 0, 0xFFFFFFFF),
+        _fixed(lux, 100, 0, 0xFFFFFFFF),
+        0,
+        RECORD_COMMIT,
     )
+    crc = binascii.crc32(buf[0:RECORD_DATA_SIZE]) & 0xFFFF
+    struct.pack_into("<H", buf, RECORD_DATA_SIZE, crc)
+
+def _record_ok(buf, offset=0, size=RECORD_SIZE):
+    """
+    True if the record at `offset` was completely written (commit marker and CRC).
+    Log records and rollup records (size=ROLLUP_SIZE) end the same way.
+    """
+    data_size = size - 4
+    crc, commit = struct.unpack_from("<HH", buf, offset + data_size)
+    if commit != RECORD_COMMIT:
+        return False
+    return binascii.crc32(memoryview(buf)[offset:offset + data_size]) & 0xFFFF == crc
+
+def _unpack_record(buf, offset=0):
+    """
+    -> (ts, temperature, humidity, co2, eco2, tvoc, aqi, pressure, lux)
+    """
+    ts, temp, hum, co2, eco2, tvoc, aqi, _, pressure, lux, _, _ = struct.unpack_from(RECORD_FMT, buf, offset)
+    return (ts, temp / 100, hum / 100, co2, eco2, tvoc, aqi, pressure / 100, lux / 100)
 
-def _parse_timestamp(s):
+def _rtc_to_mktime(t):
     """
-    'YYYY-MM-DD HH:MM:SS' -> (year, month, day, hour, minute, second)
-    time.mktime expects the following format: time.mktime((2025,11,25,20,30,57,0,0))
-    last 2 are dummy (0), mktime ignores them in MicroPython.
+    RTC tuple (year, month, day, weekday, hour, minute, second, subsecond)
+    -> tuple for time.mktime (year, month, day, hour, minute, second, 0, 0)
+    """
+    return (t[0], t[1], t[2], t[4], t[5], t[6], 0, 0)
+
+def _segment_path(log_dir, t):
     """
+    Day segment of a RTC tuple, without extension: '<log_dir>/YYYY-MM-DD'
+    """
+    return "{}/{:04d}-{:02d}-{:02d}".format(log_dir, t[0], t[1], t[2])
+
+def _day_number(y, mo, d):
+    """Days since epoch, used to compare segment dates."""
+    return time.mktime((y, mo, d, 0, 0, 0, 0, 0)) // 86400
+
+def _segment_day(name):
+    """
+    'YYYY-MM-DD.bin' -> day number, None if the name is not a day segment.
+    """
+    if len(name) != 14 or not name.endswith(LOG_EXT):
+        return None
     try:
-        date_str, time_str = s.split(" ")
-        y, mo, d = [int(x) for x in date_str.split("-")]
-        hh, mm, ss = [int(x) for x in time_str.split(":")]
-        return (y, mo, d, hh, mm, ss, 0, 0)
+        return _day_number(int(name[0:4]), int(name[5:7]), int(name[8:10]))
     except:
         return None
-    
-def _safe(value, default=0):
-    """Replace None with default so formatting doesn't crash."""
-    return value if value is not None else default
 
 def _file_exists(path):
     try:
@@ -50,18 +239,29 @@ def _file_exists(path):
         return False
 
 
-def _is_valid_csv(path):
+def _is_valid_log(path):
     try:
-        with open(path, "r") as f:
-            first = f.readline()
-            return first == CSV_HEADER
+        with _sd_open(path, "rb") as f:
+            return f.read(RECORD_SIZE) == LOG_HEADER
     except OSError:
         return False
 
 
+def _log_version(path):
+    """Format version of a segment file, None if missing or not a log."""
+    try:
+        with _sd_open(path, "rb") as f:
+            head = f.read(6)
+    except OSError:
+        return None
+    if len(head) < 6 or head[0:4] != LOG_MAGIC:
+        return None
+    return head[4]
+
+
 def _safe_remove(path):
     try:
-        os.remove(path)
+        _sd_call("remove", os.remove, path)
     except OSError:
         pass
 
@@ -69,67 +269,258 @@ def _safe_remove(path):
 def _safe_rename(src, dst):
     try:
         _safe_remove(dst)
-        os.rename(src, dst)
+        _sd_call("rename", os.rename, src, dst)
         return True
     except OSError:
         return False
 
 
+def _repair_log_tail(path, log):
+    """
+    Torn write recovery, costs at most one record.
+    A partial last record (power loss during a write) is padded with zeros
+    to a whole record, so the records appended after it stay aligned.
+    MicroPython's FAT driver can't truncate files; the padded record has
+    no commit marker and is skipped by every reader, like a record with a bad CRC.
+    """
+    seg = path + LOG_EXT
+    try:
+        size = os.stat(seg)[6]
+        torn = (size - RECORD_SIZE) % RECORD_SIZE
+        if torn:
+            with _sd_open(seg, "ab") as f:
+                _sd_write(f, bytes(RECORD_SIZE - torn))
+            log.warning("Torn last log record was discarded:", seg, "bytes:", torn)
+        elif size > RECORD_SIZE:
+            rec = bytearray(RECORD_SIZE)
+            with _sd_open(seg, "rb") as f:
+                f.seek(size - RECORD_SIZE)
+                _sd_read(f, rec)
+            if not _record_ok(rec):
+                log.warning("Last log record failed its CRC check, it is skipped:", seg)
+    except Exception as e:
+        log.error("Failed to check log tail:", seg, e)
+
 def _ensure_log_file(path, log):
-    
-    CSV_EXT = ".csv"
-    TMP_EXT = ".tmp"
-    BAK_EXT = ".bak"
-    
-    csv = path + CSV_EXT
-    tmp = path + TMP_EXT
-    bak = path + BAK_EXT
-
-    # 1) Always remove temp file (never trusted)
-    if _file_exists(tmp):
-        _safe_remove(tmp)
-        log.info("Removed temp log file:", tmp)
-
-    csv_ok = _file_exists(csv) and _is_valid_csv(csv)
-
-    # 2) If CSV is valid → cleanup backups and return
-    if csv_ok:
-        if _file_exists(bak):
-            _safe_remove(bak)
-            log.info("Removed backup log file:", bak)
+    """
+    Validate and repair one segment (path without extension), used for the
+    active segment at boot and whenever a segment has to be created.
+    """
+    seg = path + LOG_EXT
+
+    # 1) Valid segment → only the last record can be torn
+    if _file_exists(seg) and _is_valid_log(seg):
+        _repair_log_tail(path, log)
         return
 
-    # 3) CSV missing or invalid → try restore from backup
-    if _file_exists(bak) and _is_valid_csv(bak):
-        if _safe_rename(bak, csv):
-            log.warning("Restored log file from backup:", csv)
-            return
+    # 2) Unknown format or damaged header → keep it aside for the host tools.
+    #    Its index counts records of that file, it must not outlive it.
+    if _file_exists(seg):
+        if _safe_rename(seg, path + BAD_EXT):
+            log.warning("Invalid log file moved aside:", path + BAD_EXT)
+        _safe_remove(path + INDEX_EXT)
 
-    # 4) Nothing usable → create fresh CSV with header
+    # 3) Create fresh segment with header
     try:
-        with open(csv, "w") as f:
-            f.write(CSV_HEADER)
-        log.warning("Created new log file with header:", csv)
+        with _sd_open(seg, "wb") as f:
+            _sd_write(f, LOG_HEADER)
+        log.warning("Created new log file with header:", seg)
     except Exception as e:
-        log.error("Failed to create log file:", csv, e)
+        log.error("Failed to create log file:", seg, e)
+        return
+    _create_index(path, log)
+
+async def _convert_v1_segment(path, log):
+    """
+    Rewrite a version 1 segment (path without extension) in the current
+    format: every whole record gets its CRC and commit marker. The new file
+    is written next to it and renamed over it when complete; the original is
+    kept as .bad for the host tools and the stale index is removed.
+    """
+    seg = path + LOG_EXT
+    src_buf = bytearray(32 * RECORD_SIZE_V1)
+    dst_buf = bytearray(32 * RECORD_SIZE)
+    n_total = 0
+    with _sd_open(seg, "rb") as src:
+        src.seek(RECORD_SIZE_V1)
+        with _sd_open(path + TMP_EXT, "wb") as dst:
+            _sd_write(dst, LOG_HEADER)
+            while True:
+                n = _sd_read(src, src_buf) // RECORD_SIZE_V1
+                for i in range(n):
+                    fields = struct.unpack_from(RECORD_FMT_V1, src_buf, i * RECORD_SIZE_V1)
+                    o = i * RECORD_SIZE
+                    struct.pack_into(RECORD_FMT, dst_buf, o, *(fields + (0, RECORD_COMMIT)))
+                    crc = binascii.crc32(memoryview(dst_buf)[o:o + RECORD_DATA_SIZE]) & 0xFFFF
+                    struct.pack_into("<H", dst_buf, o + RECORD_DATA_SIZE, crc)
+                if n:
+                    _sd_write(dst, memoryview(dst_buf)[0:n * RECORD_SIZE])
+                    n_total += n
+                if n < 32:
+                    break
+                await _io_sleep()
+
+    _safe_remove(path + INDEX_EXT)
+    if not _safe_rename(seg, path + BAD_EXT) or not _safe_rename(path + TMP_EXT, seg):
+        raise OSError(errno.EIO)
+    log.info("Converted version 1 log segment:", seg, "records:", n_total)
+
+# ---- Legacy CSV log ----
+# Before the day segments every row was appended to one CSV file
+# (timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux). It is
+# imported once at boot and renamed aside, see _import_legacy_csv().
+LEGACY_CSV = "/sd/sensor_logs.csv"
+LEGACY_DONE_EXT = ".imported"
+
+def _parse_csv_row(line):
+    """
+    Legacy CSV row -> (ts, [temperature, humidity, co2, eco2, tvoc, aqi, pressure, lux]),
+    None for the header and broken rows.
+    """
+    parts = line.strip().split(",")
+    if len(parts) != 9:
+        return None
+    try:
+        date_str, time_str = parts[0].split(" ")
+        y, mo, d = [int(x) for x in date_str.split("-")]
+        hh, mm, ss = [int(x) for x in time_str.split(":")]
+        return time.mktime((y, mo, d, hh, mm, ss, 0, 0)), [float(x) for x in parts[1:]]
+    except:
+        return None
+
+async def _finish_legacy_day(path, dst, data, buf, log):
+    """Last records of one imported day, then the .tmp becomes the segment."""
+    try:
+        if len(data):
+            _sd_write(dst, data)
+    finally:
+        dst.close()
+    if not _safe_rename(path + TMP_EXT, path + LOG_EXT):
+        raise OSError(errno.EIO)
+    await _rebuild_index(path, buf, log)
+
+async def _import_legacy_csv(csv_path, log_dir, now_ts, keep_days, log):
+    """
+    One-off import of the legacy CSV log: its rows of the last `keep_days`
+    days are written to day segments, so the history and rollup restore
+    find them. Every day is written to a .tmp file and renamed when
+    complete; days that already have a segment are skipped. When the
+    import is done the CSV is renamed to csv_path + LEGACY_DONE_EXT, on an
+    error it is kept and the missing days are imported at the next boot.
+    """
+    if not _file_exists(csv_path):
+        return
+    log.info("Importing legacy CSV log:", csv_path)
+
+    min_ts = now_ts - keep_days * 86400
+    block = bytearray(RECORD_CHUNK)
+    mv = memoryview(block)
+    index_buf = bytearray(32 * RECORD_SIZE)
+    day = None
+    path = None        # segment of `day`, None if the day is skipped
+    dst = None
+    n = 0              # records waiting in block
+    imported = 0
+    try:
+        with _sd_open(csv_path, "r") as src:
+            lines = 0
+            for line in src:
+                lines += 1
+                if lines % 64 == 0:
+                    await _io_sleep()
+                row = _parse_csv_row(line)
+                if row is None or row[0] < min_ts or row[0] > now_ts:
+                    continue
+                ts, values = row
+
+                if ts // 86400 != day:
+                    if dst is not None:
+                        await _finish_legacy_day(path, dst, mv[0:n * RECORD_SIZE], index_buf, log)
+                        dst = None
+                    day = ts // 86400
+                    path = _segment_path(log_dir, time.localtime(ts))
+                    n = 0
+                    if _file_exists(path + LOG_EXT):
+                        log.info("Log segment exists, legacy rows skipped:", path)
+                        path = None
+                    else:
+                        dst = _sd_open(path + TMP_EXT, "wb")
+                        _sd_write(dst, LOG_HEADER)
+                if path is None:
+                    continue
+
+                _pack_record(mv[n * RECORD_SIZE:(n + 1) * RECORD_SIZE], ts, values)
+                n += 1
+                imported += 1
+                if n * RECORD_SIZE == RECORD_CHUNK:
+                    _sd_write(dst, block)
+                    n = 0
+
+        if dst is not None:
+            await _finish_legacy_day(path, dst, mv[0:n * RECORD_SIZE], index_buf, log)
+            dst = None
+    except Exception as e:
+        log.error("Failed to import legacy CSV log, retried at next boot:", csv_path, e)
+        if dst is not None:
+            try:
+                dst.close()
+            except Exception:
+                pass
+            _safe_remove(path + TMP_EXT)
+        return
+
+    log.info("Imported legacy CSV log, records:", imported)
+    if _safe_rename(csv_path, csv_path + LEGACY_DONE_EXT):
+        log.info("Legacy CSV log renamed to:", csv_path + LEGACY_DONE_EXT)
+
+def _ensure_log_dir(log_dir, log):
+    if _file_exists(log_dir):
+        return
+    try:
+        os.mkdir(log_dir)
+        log.info("Created log directory:", log_dir)
+    except OSError as e:
+        log.error("Failed to create log directory:", log_dir, e)
+
+async def _apply_retention(log_dir, t, keep_days, log):
+    """
+    Delete whole day segments that are older than `keep_days` before day of `t`.
+    """
+    oldest_day = _day_number(t[0], t[1], t[2]) - keep_days
+    try:
+        names = os.listdir(log_dir)
+    except OSError as e:
+        log.error("Failed to list log directory:", log_dir, e)
+        return
+
+    for name in names:
+        day = _segment_day(name)
+        if day is not None and day < oldest_day:
+            _safe_remove(log_dir + "/" + name)
+            _safe_remove(log_dir + "/" + name[:-len(LOG_EXT)] + INDEX_EXT)
+            _safe_remove(log_dir + "/" + name[:-len(LOG_EXT)] + BAD_EXT)
+            _safe_remove(log_dir + "/" + name[:-len(LOG_EXT)] + TMP_EXT)
+            log.info("Removed expired log segment:", name)
+            await _io_sleep()
 
 def is_sd_mounted(path="/sd"):
     try:
-        os.statvfs(path)
+        _sd_call("statvfs", os.statvfs, path)
         return True
     except OSError:
         return False
 
-def sd_card_recovery():
+async def sd_card_recovery():
+    var.system_data.sd_recovery_count += 1
 
     if is_sd_mounted("/sd"):
         os.umount("/sd")
 
     sd = pyb.SDCard()
     sd.power(False)
-    time.sleep(1)
+    await _io_sleep(1)
     sd.power(True)
-    time.sleep(1)
+    await _io_sleep(1)
     try:
         os.mount(sd, '/sd')
         log.warning("SD card recovery was done!")
@@ -140,174 +531,645 @@ def sd_card_recovery():
         
 
 
-def _append_sensor_row(path, limit_rows, log):
-    """
-    Append one sensor row and trim to last `limit_rows` data lines.
-    """
-    # Build CSV line
-    ts_tuple = var.system_data.time_rtc
-    ts_str = _format_timestamp(ts_tuple)
-
-    temp = _safe(var.sensor_data.temp_aht21)
-    hum = _safe(var.sensor_data.humidity_aht21)
-    co2 = int(_safe(var.sensor_data.co2_scd41))
-    eco2 = int(_safe(var.sensor_data.eco2_ens160))
-    tvoc = int(_safe(var.sensor_data.tvoc_ens160))
-    aqi = int(_safe(var.sensor_data.aqi_ens160))
-    pressure = _safe(var.sensor_data.pressure_bmp280)
-    lux = _safe(var.sensor_data.lux_veml7700)
-
-    # Format as strings (adjust precision as you like)
-    row = "{},{:.2f},{:.2f},{:d},{:d},{:d},{:d},{:.2f},{:.2f}\n".format(
-        ts_str,
-        temp,
-        hum,
-        co2,
-        eco2,
-        tvoc,
-        aqi,
-        pressure,
-        lux,
-    )
+class RowBuffer:
+    """
+    Write-behind buffer: preallocated RAM ring of packed log records that
+    are waiting to be written to SD. When full, the oldest record is dropped.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity * RECORD_SIZE)
+        self.mv = memoryview(self.buf)
+        self.head = 0          # slot of the oldest record
+        self.count = 0
+        self.added_ms = array("I", [0] * capacity)  # ticks_ms when each slot was filled
+        self.dropped = 0
+        self.torn_path = None  # segment of a write that failed part way, its tail needs a check
+
+    def slot(self):
+        """Memoryview of the slot for a new record, packed in place by the caller."""
+        if self.count == self.capacity:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.dropped += 1
+        i = (self.head + self.count) % self.capacity
+        self.added_ms[i] = time.ticks_ms()
+        self.count += 1
+        return self.mv[i * RECORD_SIZE:(i + 1) * RECORD_SIZE]
+
+    def offset(self, n):
+        """Offset of the n-th oldest record in self.buf"""
+        return ((self.head + n) % self.capacity) * RECORD_SIZE
+
+    def pop(self, n):
+        """Forget the `n` oldest records (they were written)."""
+        self.head = (self.head + n) % self.capacity
+        self.count -= n
+
+    def age_s(self):
+        """How long the oldest record has been waiting, 0 if empty."""
+        if self.count == 0:
+            return 0
+        return time.ticks_diff(time.ticks_ms(), self.added_ms[self.head]) // 1000
+
+def _flush_due(rows):
+    """
+    Flush policy of the write-behind buffer, limits are in shared_variables.
+    """
+    if rows.count == 0:
+        return False
+    if var.storage_flush_request:
+        return True
+    if rows.count >= var.storage_flush_rows:
+        return True
+    if rows.count * RECORD_SIZE >= var.storage_flush_bytes:
+        return True
+    if rows.age_s() >= var.storage_flush_age_s:
+        return True
+    # Low battery: don't risk losing buffered rows on power loss
+    if not var.system_data.charging and var.system_data.bat_percentage <= var.storage_flush_bat_percentage:
+        return True
+    return False
 
-    try:
-        # Read all lines
+async def _flush_rows(log_dir, rows, active_segment, keep_days, log, rollups=()):
+    """
+    Write every buffered record to the day segment of its timestamp.
+    Contiguous records of the same day go out with one write, old days are
+    dropped by _apply_retention() when a new segment is started.
+    Written records are added to the rollup tiers.
+    Returns the active segment (path without extension).
+    Raises on SD errors, records that were not written stay in the buffer;
+    the ones written before the error are indexed and removed first.
+    """
+    while rows.count:
+        start = rows.offset(0)
+        ts = struct.unpack_from("<I", rows.buf, start)[0]
+        day = ts // 86400
+
+        # Run of same-day records that doesn't wrap around the end of the ring
+        limit = min(rows.count, rows.capacity - start // RECORD_SIZE)
+        n = 1
+        while n < limit and struct.unpack_from("<I", rows.buf, start + n * RECORD_SIZE)[0] // 86400 == day:
+            n += 1
+
+        path = _segment_path(log_dir, time.localtime(ts))
+
+        # If file doesn't exist for some reason, recreate with header
+        if not _file_exists(path + LOG_EXT):
+            _ensure_log_dir(log_dir, log)
+            _ensure_log_file(path, log)
+
+        # A failed write may have left a partial record in its segment (not
+        # necessarily this one, e.g. at midnight), pad it before appending
+        if rows.torn_path is not None:
+            _repair_log_tail(rows.torn_path, log)
+            rows.torn_path = None
+
+        f = _sd_open(path + LOG_EXT, "ab")
+        size = None
+        done = 0
+        error = None
         try:
-            f = open(path + ".csv", "r")
-            lines = f.readlines()
+            size = f.tell()
+            record_no = (size - RECORD_SIZE) // RECORD_SIZE
+            mv = rows.mv[start:start + n * RECORD_SIZE]
+            for i in range(0, len(mv), RECORD_CHUNK):
+                _sd_write(f, mv[i:i + RECORD_CHUNK])
+                done = min(i + RECORD_CHUNK, len(mv)) // RECORD_SIZE
+                await _io_sleep()
+        except Exception as e:
+            error = e
+        finally:
             f.close()
-        except OSError:
-            # If file doesn't exist for some reason, recreate with header
-            lines = []
-            header = "timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux\n"
-            lines.append(header)
-
-        if not lines:
-            header = "timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux\n"
-            data_lines = []
+
+        if error is not None:
+            if size is None:
+                raise error
+            # The file size tells how many whole records reached the card,
+            # also the ones of the chunk that raised; the rest is a torn tail
+            try:
+                written = os.stat(path + LOG_EXT)[6] - size
+                done = min(written // RECORD_SIZE, n)
+                if written % RECORD_SIZE:
+                    rows.torn_path = path
+            except OSError:
+                rows.torn_path = path
+        n = done
+        if n == 0:
+            raise error
+
+        log.debug("Log records written:", path, "records:", n, "first:", _unpack_record(rows.buf, start))
+
+        # New day started (_ensure_log_file() created its index), drop the expired segments
+        if path != active_segment:
+            log.info("New log segment:", path)
+            active_segment = path
+            await _apply_retention(log_dir, time.localtime(ts), keep_days, log)
+
+        # First record of every hour goes to the index
+        last_hour = -1
+        for i in range(n):
+            fields = struct.unpack_from(RECORD_FMT, rows.buf, start + i * RECORD_SIZE)
+            ts = fields[0]
+            hour = (ts % 86400) // 3600
+            if hour != last_hour:
+                _index_record(path, record_no + i, ts, log)
+                last_hour = hour
+            for r in rollups:
+                r.add(fields, log)
+
+        rows.pop(n)
+        if error is not None:
+            raise error
+
+    return active_segment
+
+def _read_index(path):
+    """
+    Index of a segment (path without extension) as array('I'),
+    None if the index is missing or damaged.
+    """
+    idx = array("I", [INDEX_NO_ENTRY] * INDEX_HOURS)
+    try:
+        with _sd_open(path + INDEX_EXT, "rb") as f:
+            if _sd_read(f, idx) != INDEX_SIZE:
+                return None
+    except OSError:
+        return None
+    return idx
+
+def _index_record(path, record_no, ts, log):
+    """
+    Incremental index update after a record was appended to a segment.
+    Only the first record of every hour touches the index file.
+    A missing index is left to _index_rebuild_task().
+    """
+    hour = (ts % 86400) // 3600
+    try:
+        with _sd_open(path + INDEX_EXT, "r+b") as f:
+            f.seek(hour * 4)
+            if struct.unpack("<I", f.read(4))[0] != INDEX_NO_ENTRY:
+                return
+            f.seek(hour * 4)
+            _sd_write(f, struct.pack("<I", record_no))
+        log.debug("Index updated:", path, "hour:", hour, "record:", record_no)
+    except OSError as e:
+        if e.args and e.args[0] == errno.ENOENT:
+            log.debug("No log index yet, left to the rebuild:", path)
         else:
-            header = lines[0]
-            data_lines = lines[1:]
-
-        data_lines.append(row)
-
-        # Keep only newest `limit_rows` data lines
-        log.info("Log length:", len(data_lines))
-        if len(data_lines) > limit_rows:
-            data_lines = data_lines[-limit_rows:]
-            log.warning("Log length is longer than", limit_rows, ", log size was decreased to", len(data_lines))
-
-        # Write everything back
-        f = open(path + ".tmp", "w")
-        f.write(header)
-        for l in data_lines:
-            f.write(l)
-        f.close()
+            log.error("Failed to update log index:", path, e)
+    except Exception as e:
+        log.error("Failed to update log index:", path, e)
 
-        log.debug("Log row created, total rows:", len(data_lines))
-        
-        os.rename(path + ".csv", path + ".bak")
-        
-        log.debug("Log backup done")
-        
-        os.rename(path + ".tmp", path + ".csv")
-        
-        log.debug("New log saved")
-        
-        os.remove(path + ".bak")
-        
-        log.debug("Backup log deleted")
-        
+def _create_index(path, log):
+    """Empty index for a segment that was just created."""
+    try:
+        with _sd_open(path + INDEX_EXT, "wb") as f:
+            _sd_write(f, b"\xff" * INDEX_SIZE)
     except Exception as e:
-        log.error("Failed to append sensor row:", e)
-        
-        sd_card_recovery()
+        log.error("Failed to create log index:", path, e)
 
-def _load_co2_history_from_log(path, log):
+async def _rebuild_index(path, buf, log):
+    """
+    Scan a segment and write its index from scratch.
+    Yields to the loop after every block. The file is re-opened until no new
+    records show up, so rows appended while the scan was running are indexed too.
     """
-    Read /sd/sensor_logs.csv and rebuild var.scd41_co2_history
-    from all entries in the last 24 hours.
+    idx = array("I", [INDEX_NO_ENTRY] * INDEX_HOURS)
+    block_records = len(buf) // RECORD_SIZE
+    mv = memoryview(buf)
+    record_no = 0
 
-    Each entry is just one CO2 value, in chronological order.
+    while True:
+        with _sd_open(path + LOG_EXT, "rb") as f:
+            f.seek(RECORD_SIZE + record_no * RECORD_SIZE)
+            while True:
+                n = _sd_read(f, mv) // RECORD_SIZE
+                for i in range(n):
+                    if _record_ok(buf, i * RECORD_SIZE):
+                        ts = struct.unpack_from("<I", buf, i * RECORD_SIZE)[0]
+                        hour = (ts % 86400) // 3600
+                        if idx[hour] == INDEX_NO_ENTRY:
+                            idx[hour] = record_no
+                    record_no += 1
+                if n < block_records:
+                    break
+                f.seek(RECORD_SIZE + record_no * RECORD_SIZE)
+                await _io_sleep()
+
+        # No await between this check and the write below
+        if os.stat(path + LOG_EXT)[6] < RECORD_SIZE * (record_no + 2):
+            break
+
+    with _sd_open(path + INDEX_EXT, "wb") as f:
+        _sd_write(f, idx)
+    log.info("Rebuilt log index:", path, "records:", record_no)
+
+async def _index_rebuild_task(log_dir, log):
+    """
+    Background job: convert version 1 segments, then rebuild the index of
+    every segment that has none or a damaged one. Never blocks startup.
     """
     try:
-        f = open(path + ".csv", "r")
-        lines = f.readlines()
-        f.close()
-    except OSError:
-        log.warning("No log file found to restore CO2 history from:", path + ".csv")
+        names = os.listdir(log_dir)
+    except OSError as e:
+        log.error("Failed to list log directory:", log_dir, e)
         return
 
-    if len(lines) <= 1:
-        log.info("Log file has no data rows, history not restored")
-        return
+    buf = bytearray(32 * RECORD_SIZE)
+    for name in names:
+        if _segment_day(name) is None:
+            continue
+        path = log_dir + "/" + name[:-len(LOG_EXT)]
+        if _log_version(path + LOG_EXT) == 1:
+            try:
+                await _convert_v1_segment(path, log)
+            except Exception as e:
+                log.error("Failed to convert version 1 log segment:", path, e)
+                continue
+        if _read_index(path) is not None:
+            continue
+        try:
+            await _rebuild_index(path, buf, log)
+        except Exception as e:
+            log.error("Failed to rebuild log index:", path, e)
+        await _io_sleep()
 
-    now_tuple = var.system_data.time_rtc
-    # Now tuple is in the format of RTC: (2025, 11, 25, 2, 20, 12, 40, 0) where the 4th item is the weekday
-    # We need to convert it to this format: (2025, 11, 25, 20, 12, 40, 0, 0)
-    now_tuple = (now_tuple[0], now_tuple[1], now_tuple[2], now_tuple[4], now_tuple[5], now_tuple[6], 0, 0)
-    log.debug("RTC timestamp:", now_tuple)
+async def _tail_first_record(path, ts, buf):
+    """
+    Number of the first record with timestamp >= ts, found without an index:
+    the segment is read backwards from EOF in blocks of len(buf) bytes and
+    the walk stops at the first record older than ts, so the cost follows
+    the size of the window, not of the segment. Torn records are skipped.
+    None if the segment has nothing that late.
+    """
     try:
-        now_ts = time.mktime(now_tuple)
-    except Exception as e:
-        log.error("mktime not available / failed, cannot restore history:", e)
-        return
+        f = _sd_open(path + LOG_EXT, "rb")
+    except OSError:
+        return None
 
-    one_day = 24 * 60 * 60
-    min_ts = now_ts - one_day
+    try:
+        block_records = len(buf) // RECORD_SIZE
+        mv = memoryview(buf)
+        # Whole records only, a torn last record is ignored
+        total = (f.seek(0, 2) - RECORD_SIZE) // RECORD_SIZE
+        first = total
+        end = total
+        while end > 0:
+            n = min(block_records, end)
+            start = end - n
+            f.seek(RECORD_SIZE + start * RECORD_SIZE)
+            _sd_read(f, mv[0:n * RECORD_SIZE])
+            # Newest record of the block first
+            for i in range(n - 1, -1, -1):
+                if not _record_ok(buf, i * RECORD_SIZE):
+                    continue
+                if struct.unpack_from("<I", buf, i * RECORD_SIZE)[0] < ts:
+                    return first if first < total else None
+                first = start + i
+            end = start
+            await _io_sleep()
+        return first if first < total else None
+    finally:
+        f.close()
 
-    entries = []  # list of (ts_seconds, co2_int)
+async def _first_record_at(path, ts, buf):
+    """
+    Number of the first record that may have a timestamp >= ts, from the index.
+    Without a usable index (not rebuilt yet, damaged) the segment tail is
+    read backwards instead. None if the segment has nothing that late.
+    """
+    idx = _read_index(path)
+    if idx is None:
+        return await _tail_first_record(path, ts, buf)
+    for hour in range((ts % 86400) // 3600, INDEX_HOURS):
+        if idx[hour] != INDEX_NO_ENTRY:
+            return idx[hour]
+    return None
+
+async def _read_log_range(log_dir, t1, t2, buf, fn, log):
+    """
+    Call fn(buf, offset) for every valid record with t1 <= timestamp <= t2,
+    in chronological order. Every day segment in range is entered at the
+    offset given by its index (or found from the tail), then read forward in blocks of len(buf) bytes,
+    giving the loop a turn after every block.
+    Use it for any "samples between T1 and T2" query (history restore, export...).
+    Returns the number of records passed to fn.
+    """
+    count = 0
+    block_records = len(buf) // RECORD_SIZE
+    mv = memoryview(buf)
 
-    for line in lines[1:]:
-        line = line.strip()
-        if not line:
-            continue
+    day_start = t1 - t1 % 86400
+    while day_start <= t2:
+        path = _segment_path(log_dir, time.localtime(day_start))
+        from_ts = t1 if t1 > day_start else day_start
+        day_start += 86400
 
-        parts = line.split(",")
-        if len(parts) < 4:
+        try:
+            f = _sd_open(path + LOG_EXT, "rb")
+        except OSError:
             continue
 
-        ts_str = parts[0]      # 'YYYY-MM-DD HH:MM:SS'
-        co2_str = parts[3]     # co2 column
+        try:
+            if f.read(RECORD_SIZE) != LOG_HEADER:
+                if _log_version(path + LOG_EXT) == 1:
+                    log.warning("Version 1 log segment not converted yet, skipped:", path)
+                else:
+                    log.warning("Invalid log segment header, skipped:", path)
+                record_no = None
+            else:
+                record_no = await _first_record_at(path, from_ts, buf)
+            while record_no is not None:
+                f.seek(RECORD_SIZE + record_no * RECORD_SIZE)
+                n = _sd_read(f, mv) // RECORD_SIZE
+                for i in range(n):
+                    if not _record_ok(buf, i * RECORD_SIZE):
+                        continue
+                    ts = struct.unpack_from("<I", buf, i * RECORD_SIZE)[0]
+                    if ts < t1:
+                        continue
+                    if ts > t2:
+                        return count
+                    fn(buf, i * RECORD_SIZE)
+                    count += 1
+                if n < block_records:
+                    break
+                record_no += n
+                await _io_sleep()
+        finally:
+            f.close()
 
-        ts_tuple = _parse_timestamp(ts_str)
-        log.debug("Log timestamp:", ts_tuple)
-        if ts_tuple is None:
-            continue
+    return count
 
+class Rollup:
+    """
+    Running min/max/sum of one rollup tier. A window is appended to the tier
+    file when the first record of a later window arrives; the open window
+    only lives in RAM and is rebuilt from the raw log at boot, see
+    _restore_rollups().
+    """
+    def __init__(self, path, seconds):
+        self.path = path
+        self.seconds = seconds
+        self.last = None      # start of the last window in the file
+        self.start = None     # start of the open window
+        self.count = 0
+        self.lo = [0] * ROLLUP_METRICS
+        self.hi = [0] * ROLLUP_METRICS
+        self.sum = [0] * ROLLUP_METRICS
+        self.buf = bytearray(ROLLUP_SIZE)
+
+    def add(self, fields, log):
+        """Add one log record, `fields` as returned by struct.unpack(RECORD_FMT, ...)."""
+        window = fields[0] - fields[0] % self.seconds
+        # Already in the file, or the clock went backwards
+        if self.last is not None and window <= self.last:
+            return
+        if self.start is not None and window < self.start:
+            return
+        if window != self.start:
+            self.close(log)
+            self.start = window
+
+        first = self.count == 0
+        for i in range(ROLLUP_METRICS):
+            v = fields[_METRIC_FIELDS[i]]
+            if first or v < self.lo[i]:
+                self.lo[i] = v
+            if first or v > self.hi[i]:
+                self.hi[i] = v
+            self.sum[i] = v if first else self.sum[i] + v
+        self.count += 1
+
+    def close(self, log):
+        """Append the open window to the tier file."""
+        if self.count == 0:
+            return
+        n = self.count
+        mean = [(s + n // 2) // n for s in self.sum]
+        struct.pack_into(ROLLUP_FMT, self.buf, 0, self.start, min(n, 65535),
+                         *(self.lo + self.hi + mean + [0, RECORD_COMMIT]))
+        crc = binascii.crc32(self.buf[0:ROLLUP_SIZE - 4]) & 0xFFFF
+        struct.pack_into("<H", self.buf, ROLLUP_SIZE - 4, crc)
         try:
-            ts = time.mktime(ts_tuple)
-        except:
-            continue
+            if not _file_exists(self.path):
+                self.last = _ensure_rollup_file(self.path, log)
+            with _sd_open(self.path, "ab") as f:
+                _sd_write(f, self.buf)
+        except Exception as e:
+            # Raw rows are safe in the log, only this aggregate is lost
+            log.error("Failed to write rollup:", self.path, e)
+        self.last = self.start
+        self.count = 0
+
+def _unpack_rollup(buf, offset=0):
+    """
+    -> (window start, count, min, max, mean), min/max/mean are tuples of
+    (temperature, humidity, co2, eco2, tvoc, aqi, pressure, lux) in the
+    units of _unpack_record().
+    """
+    fields = struct.unpack_from(ROLLUP_FMT, buf, offset)
+    lo = tuple(fields[2 + i] / _METRIC_SCALES[i] for i in range(ROLLUP_METRICS))
+    hi = tuple(fields[2 + ROLLUP_METRICS + i] / _METRIC_SCALES[i] for i in range(ROLLUP_METRICS))
+    mean = tuple(fields[2 + 2 * ROLLUP_METRICS + i] / _METRIC_SCALES[i] for i in range(ROLLUP_METRICS))
+    return (fields[0], fields[1], lo, hi, mean)
 
-        # Only keep last 24h
-        if ts < min_ts or ts > now_ts:
-            continue
+def _ensure_rollup_file(path, log):
+    """
+    Validate a tier file like _ensure_log_file() does for segments, create
+    it if needed. Returns the window start of its last valid record, or None.
+    """
+    try:
+        with _sd_open(path, "rb") as f:
+            valid = f.read(ROLLUP_SIZE) == ROLLUP_HEADER
+    except OSError:
+        valid = None
 
+    if valid is False:
+        if _safe_rename(path, path[:-len(ROLLUP_EXT)] + BAD_EXT):
+            log.warning("Invalid rollup file moved aside:", path)
+    if not valid:
         try:
-            co2 = int(float(co2_str))
-        except:
-            continue
+            with _sd_open(path, "wb") as f:
+                _sd_write(f, ROLLUP_HEADER)
+            log.warning("Created new rollup file:", path)
+        except Exception as e:
+            log.error("Failed to create rollup file:", path, e)
+        return None
 
-        entries.append((ts, co2))
+    try:
+        size = os.stat(path)[6]
+        torn = (size - ROLLUP_SIZE) % ROLLUP_SIZE
+        if torn:
+            with _sd_open(path, "ab") as f:
+                _sd_write(f, bytes(ROLLUP_SIZE - torn))
+            size += ROLLUP_SIZE - torn
+            log.warning("Torn last rollup record was discarded:", path)
+
+        # Last valid record, torn records are skipped
+        rec = bytearray(ROLLUP_SIZE)
+        with _sd_open(path, "rb") as f:
+            pos = size - ROLLUP_SIZE
+            while pos >= ROLLUP_SIZE:
+                f.seek(pos)
+                _sd_read(f, rec)
+                if _record_ok(rec, 0, ROLLUP_SIZE):
+                    return struct.unpack_from("<I", rec, 0)[0]
+                pos -= ROLLUP_SIZE
+    except Exception as e:
+        log.error("Failed to check rollup file:", path, e)
+    return None
 
-    if not entries:
-        log.info("No recent entries (last 24h) for CO2 history")
-        return
+async def _restore_rollups(log_dir, rollups, now_ts, keep_days, log):
+    """
+    Open the tier files and rebuild the open windows from the raw log.
+    Windows that closed while the device was off are written on the way,
+    on the first boot the whole retained log is rolled up.
+    """
+    for r in rollups:
+        r.last = _ensure_rollup_file(r.path, log)
+
+    longest = rollups[-1]
+    if longest.last is not None:
+        from_ts = longest.last + longest.seconds
+    else:
+        from_ts = now_ts - now_ts % 86400 - keep_days * 86400
+
+    def add_record(buf, offset):
+        fields = struct.unpack_from(RECORD_FMT, buf, offset)
+        for r in rollups:
+            r.add(fields, log)
+
+    buf = bytearray(32 * RECORD_SIZE)
+    n = await _read_log_range(log_dir, from_ts, now_ts, buf, add_record, log)
+    log.info("Rollups restored from log, records:", n)
+
+async def _read_rollup_range(path, t1, t2, buf, fn):
+    """
+    Call fn(buf, offset) for every valid rollup record with t1 <= window
+    start <= t2. Windows are in order, so the first one is found by
+    bisection instead of a scan; then blocks of len(buf) bytes are read.
+    Returns the number of records passed to fn.
+    """
+    count = 0
+    block_records = len(buf) // ROLLUP_SIZE
+    mv = memoryview(buf)
+    try:
+        f = _sd_open(path, "rb")
+    except OSError:
+        return 0
+
+    try:
+        if f.read(ROLLUP_SIZE) != ROLLUP_HEADER:
+            return 0
+        f.seek(0, 2)
+        lo = 0
+        hi = f.tell() // ROLLUP_SIZE - 1
+        # First record with window start >= t1 (torn records read as 0)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek((mid + 1) * ROLLUP_SIZE)
+            _sd_read(f, mv[0:4])
+            if struct.unpack_from("<I", buf, 0)[0] < t1:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        record_no = lo
+        while True:
+            f.seek((record_no + 1) * ROLLUP_SIZE)
+            n = _sd_read(f, mv) // ROLLUP_SIZE
+            for i in range(n):
+                offset = i * ROLLUP_SIZE
+                if not _record_ok(buf, offset, ROLLUP_SIZE):
+                    continue
+                ts = struct.unpack_from("<I", buf, offset)[0]
+                if ts < t1:
+                    continue
+                if ts > t2:
+                    return count
+                fn(buf, offset)
+                count += 1
+            if n < block_records:
+                break
+            record_no += n
+            await _io_sleep()
+    finally:
+        f.close()
 
-    # Ensure chronological order
-    entries.sort(key=lambda x: x[0])
+    return count
 
-    # Build simple list of co2 values
-    history = [co2 for _, co2 in entries]
+async def _load_history_from_rollups(rollups, now_ts, log):
+    """
+    Restore the history tiers with the sample period of a rollup tier
+    (the 7 day tier from the hourly rollups) from the rollup means.
+    """
+    buf = bytearray(16 * ROLLUP_SIZE)
+    for k, (tier, period, samples) in enumerate(var.HISTORY_TIERS):
+        for r in rollups:
+            if r.seconds != period:
+                continue
+
+            # Mean of the channel's field in the rollup record
+            rings = []
+            for name, _, _, _ in var.HISTORY_CHANNELS:
+                ring = var.history_tiers[k][name]
+                ring.clear()
+                rings.append((ring, 2 + 2 * ROLLUP_METRICS + _METRIC_FIELDS.index(_HISTORY_FIELDS[name])))
+
+            def add_rollup(buf, offset):
+                fields = struct.unpack_from(ROLLUP_FMT, buf, offset)
+                for ring, field in rings:
+                    ring.append(fields[field])
+
+            n = await _read_rollup_range(r.path, now_ts - samples * period, now_ts, buf, add_rollup)
+            log.info("Restored history tier from rollups:", tier, "length:", n)
+
+async def _load_history_from_log(log_dir, log):
+    """
+    Rebuild every history channel (var.history) from all entries in the last 24 hours.
 
-    # Respect max history length if defined
-    max_len = getattr(var, "CO2_HISTORY_MAX", None)
-    if max_len is not None and len(history) > max_len:
-        history = history[-max_len:]
+    The index of yesterday's segment points straight to the first record
+    of the 24h window, so only the window is read, not the whole log.
+    """
+    now_tuple = var.system_data.time_rtc
+    # Now tuple is in the format of RTC: (2025, 11, 25, 2, 20, 12, 40, 0) where the 4th item is the weekday
+    # We need to convert it to this format: (2025, 11, 25, 20, 12, 40, 0, 0)
+    now_tuple = _rtc_to_mktime(now_tuple)
+    log.debug("RTC timestamp:", now_tuple)
+    try:
+        now_ts = time.mktime(now_tuple)
+    except Exception as e:
+        log.error("mktime not available / failed, cannot restore history:", e)
+        return
 
-    var.scd41_co2_history = history
-    log.info("Restored CO2 history from log, length:", len(history))
+    one_day = 24 * 60 * 60
+    min_ts = now_ts - one_day
+
+    # Straight into the rings, they keep the newest HISTORY_MAX values.
+    # History channels use the fixed-point units of the record fields.
+    rings = []
+    for name, _, _, _ in var.HISTORY_CHANNELS:
+        ring = var.history[name]
+        ring.clear()
+        rings.append((ring, _HISTORY_FIELDS[name]))
+
+    def add_record(buf, offset):
+        fields = struct.unpack_from(RECORD_FMT, buf, offset)
+        for ring, field in rings:
+            ring.append(fields[field])
+
+    # Reused block buffer: 32 records
+    buf = bytearray(32 * RECORD_SIZE)
+    await _read_log_range(log_dir, min_ts, now_ts, buf, add_record, log)
+
+    n = len(var.scd41_co2_history)
+    if not n:
+        log.info("No recent entries (last 24h) for history")
+        return
+
+    log.info("Restored history from log, channels:", len(rings), "length:", n)
 
 async def storage_task(period = 1.0):
     #Init
@@ -351,7 +1213,7 @@ async def storage_task(period = 1.0):
         sd_mounted = True
 
         # Get file system stats
-        stats = os.statvfs('/sd')
+        stats = _sd_call("statvfs", os.statvfs, "/sd")
 
         block_size = stats[0]
         total_blocks = stats[2]
@@ -376,37 +1238,99 @@ async def storage_task(period = 1.0):
         var.system_data.used_space_sd = 0
         log.error("Failed to mount SD card:", e)
         
-        sd_card_recovery()
+        await sd_card_recovery()
         
         if is_sd_mounted("/sd"):
             sd_mounted = True
 
 
-    log_file_path = "/sd/sensor_logs"
+    # We want 7 days of history, kept as one segment file per day
+    RETENTION_DAYS = 7
+
+    log_dir = "/sd/logs"
+    active_segment = None
+    rollups = [Rollup(log_dir + "/" + name + ROLLUP_EXT, seconds) for name, seconds in ROLLUP_TIERS]
+    # Segments are named by the RTC date: wait for the first RTC read
+    # (time_rtc is a placeholder string until the i2c task set it)
+    if type(var.system_data.time_rtc) != tuple:
+        log.info("Waiting for the RTC time")
+        while type(var.system_data.time_rtc) != tuple:
+            await asyncio.sleep(period)
+
     if sd_mounted:
-        _ensure_log_file(log_file_path, log)
-        _load_co2_history_from_log(log_file_path, log)
+        _ensure_log_dir(log_dir, log)
+        now_ts = time.mktime(_rtc_to_mktime(var.system_data.time_rtc))
+        await _import_legacy_csv(LEGACY_CSV, log_dir, now_ts, RETENTION_DAYS, log)
+        active_segment = _segment_path(log_dir, var.system_data.time_rtc)
+        # Today's segment is appended to: convert a version 1 one right away,
+        # older ones are converted by _index_rebuild_task()
+        if _log_version(active_segment + LOG_EXT) == 1:
+            try:
+                await _convert_v1_segment(active_segment, log)
+            except Exception as e:
+                log.error("Failed to convert version 1 log segment:", active_segment, e)
+        _ensure_log_file(active_segment, log)
+        await _apply_retention(log_dir, var.system_data.time_rtc, RETENTION_DAYS, log)
+        await _load_history_from_log(log_dir, log)
+        await _restore_rollups(log_dir, rollups, now_ts, RETENTION_DAYS, log)
+        await _load_history_from_rollups(rollups, now_ts, log)
+        asyncio.create_task(_index_rebuild_task(log_dir, log))
     else:
         log.error("SD card is not mounted by storage task:", e)
 
     var.history_loaded = True
 
-    # We want 7 days * 24h * 12 samples/h (5 min) = 2016 rows
-    MAX_ROWS = 7 * 24 * 12   # data rows (excluding header)
+    # Write-behind buffer for log rows
+    rows = RowBuffer(var.storage_buffer_rows)
+    retry_ms = time.ticks_ms()
 
-    # Accumulator for 5-minute interval
-    save_interval_s = 5 * 60  # 300 seconds
-    elapsed = 0.0
+    # One row per closed RTC aligned window of the save interval (5 minutes
+    # by default), the window means are computed once for history and storage
+    clock = var.clock_window
+    level = clock.level(var.storage_save_interval_s)
+    seen = clock.seq[level]
+    missed = 0
 
     #Run
-    while True:
-        #log.debug("Task is running")      
-
-        elapsed += period
-        if elapsed >= save_interval_s:
-            elapsed = 0.0
-            _append_sensor_row(log_file_path, MAX_ROWS, log)
-
-        var.system_data.storage_task_timestamp = time.time()
-
-        await asyncio.sleep(period)
+    try:
+        while True:
+            #log.debug("Task is running")      
+
+            # Every window closed since the last turn, also when a flush or
+            # a card recovery took longer than the save interval
+            while seen != clock.seq[level]:
+                seen += 1
+                window = clock.closed(level, seen)
+                if window is None:
+                    missed += 1
+                    continue
+                _pack_record(rows.slot(), window[0], window[1])
+                log.debug("Log row buffered, rows:", rows.count)
+            if missed:
+                log.warning("Missed aggregate windows:", missed)
+                missed = 0
+
+            if _flush_due(rows) and time.ticks_diff(time.ticks_ms(), retry_ms) >= 0:
+                try:
+                    active_segment = await _flush_rows(log_dir, rows, active_segment, RETENTION_DAYS, log, rollups)
+                    var.storage_flush_request = False
+                except Exception as e:
+                    log.error("Failed to write sensor rows:", e, "buffered:", rows.count, "dropped:", rows.dropped)
+                    # Don't hammer a failing card, retry in a minute
+                    retry_ms = time.ticks_add(time.ticks_ms(), 60 * 1000)
+
+                    await sd_card_recovery()
+
+            var.system_data.storage_task_timestamp = time.time()
+
+            await asyncio.sleep(period)
+
+    except asyncio.CancelledError:
+        # Shutdown: don't lose the buffered rows
+        if rows.count:
+            log.warning("Storage task stopped, flushing rows:", rows.count)
+            try:
+                await _flush_rows(log_dir, rows, active_segment, RETENTION_DAYS, log, rollups)
+            except Exception as e:
+                log.error("Failed to flush sensor rows on shutdown:", e)
+        raise
@@ -1,3 +1,7 @@
+from ring_buffer import RingBuffer
+from rolling_stats import RollingStats
+from clock_window import ClockWindow
+
 class SensorData:
     def __init__(self):
         self.temp_aht21 = 10.1
@@ -29,15 +33,18 @@ class SystemData:
         self.used_heap = 69
         self.bl_duty_percent = 34
         self.i2c_devices = []
-        self.i2c_status_scd41  = "NA"
-        self.i2c_status_aht21  = "NA"
-        self.i2c_status_ens160  = "NA"
-        self.i2c_status_bmp280  = "NA"
-        self.i2c_status_veml7700  = "NA"
-        self.i2c_status_ds3231  = "NA"
-        self.i2c_status_pca9685  = "NA"
-        self.i2c_status_drv2605  = "NA"
-        self.i2c_status_unknown = [0x69]
+        # Presence of the I2C_DEVICES, bit i is device i. Set/cleared by every
+        # transaction and by the background rescans, see i2c_task
+        self.i2c_present = 0
+        self.i2c_checked = 0          # bits whose presence is known yet
+        self.i2c_status_unknown = []  # addresses found by the last scan that are not in I2C_DEVICES
+        self.i2c_status_version = 0   # incremented on every change of the above and of i2c_stats
+        # Per I2C_DEVICES entry, then unknown addresses: (transactions/s, bytes/s,
+        # mean latency [ms], max latency [ms], NACKs, timeouts), see InstrumentedI2C
+        self.i2c_stats = []
+        self.i2c_bus_util = 0         # % of time the bus was held, since the previous i2c_task cycle
+        self.i2c_queue_depth = 0      # transactions waiting for the bus
+        self.i2c_queue_max = 0        # deepest queue since the previous i2c_task cycle
         self.usb_volt = 4.85
         self.bat_volt = 3.8
         self.dcdc_volt = 4.69
@@ -51,22 +58,138 @@ class SystemData:
         self.idle_task_timestamp = 0
         self.serial_task_timestamp = 0
         self.storage_task_timestamp = 0
-
+        self.storage_max_stall_ms = 0
+        # SD card health, see storage_task: latency histogram per operation
+        # (bins split at SD_LATENCY_BUCKETS_MS), worst latency and error count
+        self.sd_latency_hist = {op: [0] * (len(SD_LATENCY_BUCKETS_MS) + 1) for op in SD_OPS}
+        self.sd_latency_max_ms = {op: 0 for op in SD_OPS}
+        self.sd_errors = {op: 0 for op in SD_OPS}
+        self.sd_bytes_written = 0
+        self.sd_recovery_count = 0
+        self.history_ram = {}   # bytes per history channel, filled by history_task
+        self.stats_ram = 0      # bytes of the rolling statistics
+
+
+# Known I2C(1) devices, in the order of the System table rows
+I2C_DEVICES = (
+    ("SCD41",    0x62),
+    ("AHT21",    0x38),
+    ("ENS160",   0x53),
+    ("BMP280",   0x76),
+    ("VEML7700", 0x10),
+    ("DS3231",   0x68),
+    ("DRV2605",  0x5A),
+    ("PCA9685",  0x40),
+)
+
+# I2CBus arbiter of I2C(1), created by i2c_task. Other tasks queue their
+# transactions with `async with var.i2c_bus.hold(prio) as i2c:`
+i2c_bus = None
+
+# i2c_task: sample period of every device [s]
+i2c_period_scd41 = 2.5       # a new measurement every 5 s, polled at twice the rate
+i2c_period_ds3231 = 1.0
+i2c_period_aht21 = 2.0
+i2c_period_ens160 = 2.0
+i2c_period_bmp280 = 10.0
+i2c_period_veml7700 = 2.0    # backlight follows the ambient light
+i2c_period_led = 0.3         # PCA9685 is only written when the LED color changes
+i2c_period_scan = 60.0       # background rescan, sooner after a failed transaction
+i2c_rescan_min_s = 5.0       # but never more often than this
+i2c_stats_period_s = 10.0    # window of the per-device transaction statistics
 
 aht21_temp_offset = 0
 aht21_humidity_offset = 0
 
 # Max number of samples you expect (24h at 5 min)
-CO2_HISTORY_MAX = 12 * 24
+HISTORY_MAX = 12 * 24
+CO2_HISTORY_MAX = HISTORY_MAX
+
+# History channels: averages of one SensorData field each, stored in
+# the fixed-point units of the sensor log record (value * scale), so
+# storage_task restores them from the log without conversion
+HISTORY_CHANNELS = (
+    # name,      SensorData attribute, typecode, scale
+    ("co2",      "co2_scd41",          "H",      1),
+    ("temp",     "temp_aht21",         "h",      100),
+    ("humidity", "humidity_aht21",     "H",      100),
+    ("tvoc",     "tvoc_ens160",        "H",      1),
+    ("eco2",     "eco2_ens160",        "H",      1),
+    ("pressure", "pressure_bmp280",    "I",      100),
+    ("lux",      "lux_veml7700",       "I",      100),
+)
+# Cascaded history tiers, history_task fills the first one with 1 minute
+# averages, every other tier averages the samples of the tier before it
+HISTORY_TIERS = (
+    # name, sample period [s], samples
+    ("1h",  60,   60),
+    ("24h", 300,  HISTORY_MAX),
+    ("7d",  3600, 7 * 24),
+)
+# Only the CO2 rings track the sliding max (peak, chart range)
+history_tiers = [
+    {name: RingBuffer(samples, typecode, track_max=name == "co2") for name, _, typecode, _ in HISTORY_CHANNELS}
+    for _, _, samples in HISTORY_TIERS
+]
+history = history_tiers[1]   # 5 min averages of the last 24h, restored from the log
+chart_tier = 1               # history tier shown on the CO2 chart, tap the chart to change
+
+# Rolling statistics of every SensorData field, fed by history_task
+STATS_WINDOWS = (
+    # name, bucket length [s], buckets
+    ("5m",  60,   5),
+    ("1h",  300,  12),
+    ("24h", 7200, 12),
+)
+STATS_FIELDS = (
+    # SensorData attribute, histogram range for P50/P95
+    ("temp_aht21",      -10,  50),
+    ("temp_scd41",      -10,  50),
+    ("temp_bmp280",     -10,  50),
+    ("humidity_aht21",  0,    100),
+    ("humidity_scd41",  0,    100),
+    ("co2_scd41",       400,  2800),
+    ("eco2_ens160",     400,  2800),
+    ("tvoc_ens160",     0,    1200),
+    ("aqi_ens160",      1,    6),
+    ("pressure_bmp280", 950,  1050),
+    ("lux_veml7700",    0,    1200),
+)
+rolling_stats = RollingStats(STATS_FIELDS, STATS_WINDOWS)
 
 scd41_co2_peak_ppm = 400
 scd41_co2_threshold = 1300
 scd41_co2_detected = 0
-scd41_co2_history = [400] # Must contain 1 placeholder element
+scd41_co2_history = history["co2"] # 5 min averages, the live value is sensor_data.co2_scd41
 scd41_co2_max_history_samples = 60
 
 history_loaded = False
 
+# Sensor log: one row (mean of the RTC aligned window) every storage_save_interval_s, rows are buffered in RAM
+# and written to SD when any of the flush limits below is reached
+storage_save_interval_s = 5 * 60
+storage_buffer_rows = 64              # RAM buffer capacity, oldest rows are dropped when full
+storage_flush_rows = 6
+storage_flush_bytes = 1024
+storage_flush_age_s = 30 * 60
+storage_flush_bat_percentage = 15     # flush every row below this battery level (when not charging)
+storage_flush_request = False         # set to True to force a flush (e.g. before power off)
+
+# SD card operations measured by storage_task and their latency histogram bins
+SD_OPS = ("open", "write", "rename", "remove", "statvfs")
+SD_LATENCY_BUCKETS_MS = (2, 10, 50, 200, 1000)   # upper bounds, last bin is everything slower
+
+# RTC aligned aggregation windows shared by history and storage: one window
+# per history tier period and the log interval (each a multiple of the one before)
+AGGREGATE_FIELDS = (
+    "temp_aht21", "humidity_aht21", "co2_scd41", "eco2_ens160",
+    "tvoc_ens160", "aqi_ens160", "pressure_bmp280", "lux_veml7700",
+)
+# The last clock_window_depth closed windows are queued per level, the storage
+# task catches up on them after a long flush or card recovery
+clock_window_depth = 12
+clock_window = ClockWindow(AGGREGATE_FIELDS, sorted(set([period for _, period, _ in HISTORY_TIERS] + [storage_save_interval_s])), clock_window_depth)
+
 time_offset_ntp = 1
 
 free_space = 0
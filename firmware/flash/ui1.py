@@ -129,7 +129,7 @@ def create_sensor_table():
 
     # 2 columns and 15 rows
     table.set_col_cnt(2)
-    table.set_row_cnt(11)
+    table.set_row_cnt(14)
 
     table.set_col_width(0, 250)
     table.set_col_width(1, 180)
@@ -158,6 +158,16 @@ def create_sensor_table():
     table.set_cell_value(8, 0, "AQI")
     table.set_cell_value(9, 0, "Pressure [hPa]")
     table.set_cell_value(10, 0, "Lux")
+    table.set_cell_value(11, 0, "CO2 5 min mean / std")
+    table.set_cell_value(12, 0, "CO2 1 h P50 / P95")
+    table.set_cell_value(13, 0, "CO2 24 h min / max")
+
+    # Rolling statistics of the CO2 field
+    stats = var.rolling_stats
+    co2_field = [name for name, _, _ in var.STATS_FIELDS].index("co2_scd41")
+    w_5m = stats.window_index("5m")
+    w_1h = stats.window_index("1h")
+    w_24h = stats.window_index("24h")
 
 
     # --- LVGL task: pull Python vars & update table ---
@@ -174,6 +184,13 @@ def create_sensor_table():
         table.set_cell_value(8, 1, "{}".format(int(var.sensor_data.aqi_ens160)))
         table.set_cell_value(9, 1, "{}".format(int(var.sensor_data.pressure_bmp280)))
         table.set_cell_value(10, 1, "{:.2f}".format(var.sensor_data.lux_veml7700))
+        # (count, mean, variance, min, max, p50, p95), None until the first sample
+        s = stats.summary(w_5m, co2_field)
+        table.set_cell_value(11, 1, "{:.0f} / {:.0f}".format(s[1], s[2] ** 0.5) if s else "-")
+        s = stats.summary(w_1h, co2_field)
+        table.set_cell_value(12, 1, "{:.0f} / {:.0f}".format(s[5], s[6]) if s else "-")
+        s = stats.summary(w_24h, co2_field)
+        table.set_cell_value(13, 1, "{:.0f} / {:.0f}".format(s[3], s[4]) if s else "-")
 
     # --- Update table in every 500ms ---
     lv.task_create(table_update_cb, 500, lv.TASK_PRIO.LOW, None)
@@ -279,7 +296,7 @@ def create_system_table():
 
     # 2 columns and 15 rows
     table.set_col_cnt(2)
-    table.set_row_cnt(31)
+    table.set_row_cnt(43)
 
     table.set_col_width(0, 180)
     table.set_col_width(1, 250)
@@ -328,8 +345,22 @@ def create_system_table():
     table.set_cell_value(28, 0, "Idle task")
     table.set_cell_value(29, 0, "Serial task")
     table.set_cell_value(30, 0, "Storage task")
+    table.set_cell_value(31, 0, "SD open")
+    table.set_cell_value(32, 0, "SD write")
+    table.set_cell_value(33, 0, "SD rename")
+    table.set_cell_value(34, 0, "SD remove")
+    table.set_cell_value(35, 0, "SD statvfs")
+    table.set_cell_value(36, 0, "SD written")
+    table.set_cell_value(37, 0, "SD recoveries")
+    table.set_cell_value(38, 0, "Storage max stall")
+    table.set_cell_value(39, 0, "History RAM")
+    table.set_cell_value(40, 0, "Statistics RAM")
+    table.set_cell_value(41, 0, "I2C bus load")
+    table.set_cell_value(42, 0, "I2C queue")
 
     # --- LVGL task: pull Python vars & update table ---
+    i2c_version = [-1]   # i2c_status_version shown in the i2c rows
+
     def table_update_cb(task):
         # Read your Python variables here     
         table.set_cell_value(0, 1, var.system_data.status_wifi)
@@ -349,19 +380,27 @@ def create_system_table():
         table.set_cell_value(6, 1, "{}kB / {}kB".format(int(var.system_data.used_heap), int(var.system_data.total_heap)))
         table.set_cell_value(7, 1, "{:.2f}".format(var.sensor_data.lux_veml7700)) # This comes from sensor data!
         table.set_cell_value(8, 1, "{} / 1000".format(int(var.system_data.bl_duty_percent)))
-        table.set_cell_value(9, 1, "{}".format(var.system_data.i2c_status_scd41))
-        table.set_cell_value(10, 1, "{}".format(var.system_data.i2c_status_aht21))
-        table.set_cell_value(11, 1, "{}".format(var.system_data.i2c_status_ens160))
-        table.set_cell_value(12, 1, "{}".format(var.system_data.i2c_status_bmp280))
-        table.set_cell_value(13, 1, "{}".format(var.system_data.i2c_status_veml7700))
-        table.set_cell_value(14, 1, "{}".format(var.system_data.i2c_status_ds3231))
-        table.set_cell_value(15, 1, "{}".format(var.system_data.i2c_status_drv2605))
-        table.set_cell_value(16, 1, "{}".format(var.system_data.i2c_status_pca9685))
-        if len(var.system_data.i2c_status_unknown) > 0:
-            hex_list = ["0x{:02X}".format(v) for v in var.system_data.i2c_status_unknown]
-            table.set_cell_value(17, 1, "Unknown device(s) at {}".format(", ".join(hex_list)))
-        else:
-            table.set_cell_value(17, 1, "There are no unknown devices.")
+        # i2c rows only change with the presence bits
+        if var.system_data.i2c_status_version != i2c_version[0]:
+            i2c_version[0] = var.system_data.i2c_status_version
+            for i, (name, address) in enumerate(var.I2C_DEVICES):
+                bit = 1 << i
+                if not var.system_data.i2c_checked & bit:
+                    status = "NA"
+                elif var.system_data.i2c_present & bit:
+                    status = "{} is online at 0x{:02X}".format(name, address)
+                else:
+                    status = "{} is NOT found at 0x{:02X}".format(name, address)
+                if i < len(var.system_data.i2c_stats):
+                    tps, bps, mean_ms, max_ms, nacks, timeouts = var.system_data.i2c_stats[i]
+                    status += "\n{:.1f} tr/s, {:.0f} B/s, {:.2f}/{:.2f} ms, NACK {}, timeout {}".format(
+                        tps, bps, mean_ms, max_ms, nacks, timeouts)
+                table.set_cell_value(9 + i, 1, status)
+            if len(var.system_data.i2c_status_unknown) > 0:
+                hex_list = ["0x{:02X}".format(v) for v in var.system_data.i2c_status_unknown]
+                table.set_cell_value(17, 1, "Unknown device(s) at {}".format(", ".join(hex_list)))
+            else:
+                table.set_cell_value(17, 1, "There are no unknown devices.")
         table.set_cell_value(18, 1, "{:.2f}".format(var.system_data.usb_volt))
         table.set_cell_value(19, 1, "{:.2f}".format(var.system_data.dcdc_volt))
         table.set_cell_value(20, 1, "{:.2f}".format(var.system_data.bat_volt))
@@ -375,6 +414,19 @@ def create_system_table():
         table.set_cell_value(28, 1, "{}".format(var.system_data.idle_task_timestamp))
         table.set_cell_value(29, 1, "{}".format(var.system_data.serial_task_timestamp))
         table.set_cell_value(30, 1, "{}".format(var.system_data.storage_task_timestamp))
+        # SD latency histogram (bins split at SD_LATENCY_BUCKETS_MS), worst latency, errors
+        for row, op in enumerate(var.SD_OPS, 31):
+            table.set_cell_value(row, 1, "{} | max {:.0f}ms | err {}".format(
+                "/".join(str(n) for n in var.system_data.sd_latency_hist[op]),
+                var.system_data.sd_latency_max_ms[op],
+                var.system_data.sd_errors[op]))
+        table.set_cell_value(36, 1, "{}kB".format(var.system_data.sd_bytes_written // 1024))
+        table.set_cell_value(37, 1, "{}".format(var.system_data.sd_recovery_count))
+        table.set_cell_value(38, 1, "{:.0f}ms".format(var.system_data.storage_max_stall_ms))
+        table.set_cell_value(39, 1, " | ".join("{} {}B".format(name, n) for name, n in var.system_data.history_ram.items()))
+        table.set_cell_value(40, 1, "{}B".format(var.system_data.stats_ram))
+        table.set_cell_value(41, 1, "{:.1f}%".format(var.system_data.i2c_bus_util))
+        table.set_cell_value(42, 1, "{} (max {})".format(var.system_data.i2c_queue_depth, var.system_data.i2c_queue_max))
 
 
     # --- Update table in every 1000ms ---
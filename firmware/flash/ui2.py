@@ -130,6 +130,11 @@ def create_co2_chart():
     co2_last_label.set_text("")       # starts empty
     co2_last_label.set_auto_realign(True)
 
+    # Time span of the shown history tier, top right
+    zoom_label = lv.label(scr)
+    zoom_label.set_text(var.HISTORY_TIERS[var.chart_tier][0])
+    zoom_label.align(scr, lv.ALIGN.IN_TOP_RIGHT, -10, STATUS_BAR_H + 2)
+
     # Line chart
     chart.set_type(lv.chart.TYPE.LINE)
 
@@ -190,31 +195,23 @@ def create_co2_chart():
 
     def update_co2_chart_cb(task):
 
-        data = var.scd41_co2_history
-        n = len(data)
-
-        if n == 0:
-            # Nothing to show
-            chart.set_point_count(1)
-            chart.set_point_id(ser, 0, 0)
-            return
+        # Averages of the selected history tier (read in place) + the live value
+        data = var.history_tiers[var.chart_tier]["co2"]
+        live = var.sensor_data.co2_scd41
+        live = int(live) if live is not None else 0
+        n = len(data) + 1
 
-        # --- SPECIAL CASE: only 1 item -> draw a flat line ---
-        if n == 1:
-            data = data*2
+        # --- SPECIAL CASE: no history yet -> draw a flat line of the live value ---
+        flat = n == 1
+        if flat:
             n = 2
 
-        # Safety clamp: never above max expected
-        if n > var.CO2_HISTORY_MAX:
-            data = data[-var.CO2_HISTORY_MAX:]
-            n = len(data)
-
-        # Make LVGL series length follow your list length
+        # Make LVGL series length follow the history length
         chart.set_point_count(n)
 
         # Optional: dynamic Y range based on actual data
         y_min = 300 #min(data)
-        y_max = max(data)
+        y_max = max(data.max(), live)
 
         # Avoid max < min
         if y_max < y_min:
@@ -232,9 +229,12 @@ def create_co2_chart():
         # Or comment this out to stick to fixed 0…3000 range above
         chart.set_y_range(lv.chart.AXIS.PRIMARY_Y, y_min, y_max)
 
-        # Copy list → chart
+        # Ring → chart, no copy
         for i, val in enumerate(data):
             chart.set_point_id(ser, val, i)
+        if flat:
+            chart.set_point_id(ser, live, 0)
+        chart.set_point_id(ser, live, n - 1)
 
         # Choose labels
         steps = y_grids
@@ -250,7 +250,7 @@ def create_co2_chart():
         chart.set_y_tick_texts(label_text, len(labels), lv.chart.AXIS.PRIMARY_Y)
         chart.set_y_tick_length(0, 0)
 
-        last_val = data[-1]
+        last_val = live
         last_index = n - 1
         place_last_value_label(chart, ser, last_val, last_index, y_min, y_max + 70)
 
@@ -260,9 +260,24 @@ def create_co2_chart():
     # --- Update chart in every 1000ms ---
     lv.task_create(update_co2_chart_cb, 1000, lv.TASK_PRIO.LOW, None)
 
-    # --- Enable swipe on the full screen and table ---
+    def chart_event_cb(obj, event):
+        # A tap (no real movement) zooms: 1h -> 24h -> 7d, anything else is a swipe
+        swipe_event_cb(obj, event)
+        if event != lv.EVENT.RELEASED:
+            return
+        indev = lv.indev_get_act()
+        if not indev:
+            return
+        p = lv.point_t()
+        indev.get_point(p)
+        if abs(p.x - var.touch_start_x) < LOCK_THRESHOLD and abs(p.y - var.touch_start_y) < LOCK_THRESHOLD:
+            var.chart_tier = (var.chart_tier + 1) % len(var.HISTORY_TIERS)
+            zoom_label.set_text(var.HISTORY_TIERS[var.chart_tier][0])
+            update_co2_chart_cb(None)
+
+    # --- Enable swipe on the full screen and table, tap to zoom on the chart ---
     scr.set_event_cb(swipe_event_cb)
-    chart.set_event_cb(swipe_event_cb)
+    chart.set_event_cb(chart_event_cb)
 
     chart.set_style_local_border_width(lv.btn.PART.MAIN, lv.STATE.DEFAULT, 0)
     chart.set_style_local_outline_width(lv.btn.PART.MAIN, lv.STATE.DEFAULT, 0)
@@ -277,6 +292,7 @@ def create_co2_chart():
     chart.set_style_local_text_color(lv.chart.PART.BG, lv.STATE.DEFAULT, lv.color_hex(0xCCCCCC))
     co2_last_label.set_style_local_text_color(lv.obj.PART.MAIN, lv.STATE.DEFAULT, lv.color_hex(0x00FF00))
     co2_last_label.set_style_local_bg_opa(lv.obj.PART.MAIN, lv.STATE.DEFAULT, lv.OPA.TRANSP)
+    zoom_label.set_style_local_text_color(lv.obj.PART.MAIN, lv.STATE.DEFAULT, lv.color_hex(0xCCCCCC))
     
     # Add a faded area effect
     chart.set_style_local_bg_opa(lv.chart.PART.SERIES, lv.STATE.DEFAULT, lv.OPA._50)               # Max. opa.
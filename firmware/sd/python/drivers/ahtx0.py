@@ -1,5 +1,6 @@
 
 import utime
+import uasyncio as asyncio
 from micropython import const
 
 
@@ -12,22 +13,44 @@ class AHT10:
     AHTX0_CMD_SOFTRESET = const(0xBA)  # Soft reset command
     AHTX0_STATUS_BUSY = const(0x80)  # Status bit for busy
     AHTX0_STATUS_CALIBRATED = const(0x08)  # Status bit for calibrated
+    AHTX0_MEASUREMENT_MS = const(80)  # Conversion time after a trigger
 
-    def __init__(self, i2c, address=AHTX0_I2CADDR_DEFAULT):
-        utime.sleep_ms(20)  # 20ms delay to wake up
+    def __init__(self, i2c, address=AHTX0_I2CADDR_DEFAULT, init=True):
         self._i2c = i2c
         self._address = address
         self._buf = bytearray(6)
-        self.reset()
-        if not self.initialize():
-            raise RuntimeError("Could not initialize")
+        self._cmd1 = memoryview(self._buf)[:1]  # command views, slicing the buffer would allocate
+        self._cmd3 = memoryview(self._buf)[:3]
         self._temp = None
         self._humidity = None
+        # init=False: the caller awaits init_async() instead of blocking
+        if init:
+            utime.sleep_ms(20)  # 20ms delay to wake up
+            self.reset()
+            if not self.initialize():
+                raise RuntimeError("Could not initialize")
+
+    async def init_async(self):
+        """Wake up, reset and initialize without blocking the event loop"""
+        await asyncio.sleep_ms(20)
+        self._buf[0] = self.AHTX0_CMD_SOFTRESET
+        self._i2c.writeto(self._address, self._cmd1)
+        await asyncio.sleep_ms(20)
+        self._buf[0] = self.AHTX0_CMD_INITIALIZE
+        self._buf[1] = 0x08
+        self._buf[2] = 0x00
+        self._i2c.writeto(self._address, self._cmd3)
+        for _ in range(20):
+            if not self.status & self.AHTX0_STATUS_BUSY:
+                break
+            await asyncio.sleep_ms(5)
+        if not self.status & self.AHTX0_STATUS_CALIBRATED:
+            raise RuntimeError("Could not initialize")
 
     def reset(self):
         """Perform a soft-reset of the AHT"""
         self._buf[0] = self.AHTX0_CMD_SOFTRESET
-        self._i2c.writeto(self._address, self._buf[0:1])
+        self._i2c.writeto(self._address, self._cmd1)
         utime.sleep_ms(20)  # 20ms delay to wake up
 
     def initialize(self):
@@ -35,7 +58,7 @@ class AHT10:
         self._buf[0] = self.AHTX0_CMD_INITIALIZE
         self._buf[1] = 0x08
         self._buf[2] = 0x00
-        self._i2c.writeto(self._address, self._buf[0:3])
+        self._i2c.writeto(self._address, self._cmd3)
         self._wait_for_idle()
         if not self.status & self.AHTX0_STATUS_CALIBRATED:
             return False
@@ -51,19 +74,54 @@ class AHT10:
     def relative_humidity(self):
         """The measured relative humidity in percent."""
         self._perform_measurement()
-        self._humidity = (
-            (self._buf[1] << 12) | (self._buf[2] << 4) | (self._buf[3] >> 4)
-        )
-        self._humidity = (self._humidity * 100) / 0x100000
+        self._decode_humidity()
         return self._humidity
 
     @property
     def temperature(self):
         """The measured temperature in degrees Celcius."""
         self._perform_measurement()
+        self._decode_temperature()
+        return self._temp
+
+    def start_measurement(self):
+        """Trigger one conversion, the result is ready after AHTX0_MEASUREMENT_MS"""
+        self._trigger_measurement()
+
+    def read_measurement(self):
+        """Read the conversion started by start_measurement().
+        Returns (temperature, relative_humidity) decoded from the same
+        buffer, None while the sensor is still busy.
+        """
+        self._read_to_buffer()
+        if self._buf[0] & self.AHTX0_STATUS_BUSY:
+            return None
+        self._decode_temperature()
+        self._decode_humidity()
+        return self._temp, self._humidity
+
+    async def read_async(self):
+        """One combined conversion without blocking the event loop.
+        Returns (temperature, relative_humidity).
+        """
+        self.start_measurement()
+        await asyncio.sleep_ms(self.AHTX0_MEASUREMENT_MS)
+        for _ in range(20):
+            result = self.read_measurement()
+            if result is not None:
+                return result
+            await asyncio.sleep_ms(5)
+        raise RuntimeError("Conversion timeout")
+
+    def _decode_humidity(self):
+        self._humidity = (
+            (self._buf[1] << 12) | (self._buf[2] << 4) | (self._buf[3] >> 4)
+        )
+        self._humidity = (self._humidity * 100) / 0x100000
+
+    def _decode_temperature(self):
         self._temp = ((self._buf[3] & 0xF) << 16) | (self._buf[4] << 8) | self._buf[5]
         self._temp = ((self._temp * 200.0) / 0x100000) - 50
-        return self._temp
 
     def _read_to_buffer(self):
         """Read sensor data to buffer"""
@@ -74,7 +132,7 @@ class AHT10:
         self._buf[0] = self.AHTX0_CMD_TRIGGER
         self._buf[1] = 0x33
         self._buf[2] = 0x00
-        self._i2c.writeto(self._address, self._buf[0:3])
+        self._i2c.writeto(self._address, self._cmd3)
 
     def _wait_for_idle(self):
         """Wait until sensor can receive a new command"""
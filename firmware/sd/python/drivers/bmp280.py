@@ -1,5 +1,8 @@
+import time
+import uasyncio as asyncio
 from micropython import const
 from ustruct import unpack as unp
+from drivers2.i2c_device import I2CDevice
 
 # Author David Stenwall (david at stenwall.io)
 
@@ -35,6 +38,9 @@ BMP280_STANDBY_1000 = const(5)
 BMP280_STANDBY_2000 = const(6)
 BMP280_STANDBY_4000 = const(7)
 
+# Standby setting -> standby time in ms
+_BMP280_STANDBY_MS = (0.5, 62.5, 125, 250, 500, 1000, 2000, 4000)
+
 # IIR Filter setting
 BMP280_IIR_FILTER_OFF = const(0)
 BMP280_IIR_FILTER_2 = const(1)
@@ -89,6 +95,7 @@ class BMP280:
     def __init__(self, i2c_bus, addr=0x76, use_case=BMP280_CASE_HANDHELD_DYN):
         self._bmp_i2c = i2c_bus
         self._i2c_addr = addr
+        self._dev = I2CDevice(i2c_bus, addr, 2)
 
         # read calibration data
         # < little-endian
@@ -115,25 +122,38 @@ class BMP280:
         self._p_raw = 0
         self._p = 0
 
+        self._data = bytearray(6)  # burst read buffer of 0xF7..0xFC
+
         self.read_wait_ms = 0  # interval between forced measure and readout
-        self._new_read_ms = 200  # interval between
-        self._last_read_ts = 0
+        self._standby_ms = 0.5
+        self._new_read_ms = 200  # interval between new data: standby + measurement
+        self._last_read_ts = None
+        self._mode = BMP280_POWER_SLEEP
 
         if use_case is not None:
             self.use_case(use_case)
 
     def _read(self, addr, size=1):
-        return self._bmp_i2c.readfrom_mem(self._i2c_addr, addr, size)
+        return self._dev.read(addr, size)
 
     def _write(self, addr, b_arr):
         if not type(b_arr) is bytearray:
-            b_arr = bytearray([b_arr])
-        return self._bmp_i2c.writeto_mem(self._i2c_addr, addr, b_arr)
+            return self._dev.write_u8(addr, b_arr)
+        return self._dev.write(addr, b_arr)
+
+    def _update_read_interval(self):
+        self._new_read_ms = int(self._standby_ms + self.read_wait_ms)
 
     def _gauge(self):
-        # TODO limit new reads
+        # The sensor has no new data before standby + measurement time,
+        # faster reads return the last measurement
+        now = time.ticks_ms()
+        if self._last_read_ts is not None and time.ticks_diff(now, self._last_read_ts) < self._new_read_ms:
+            return
         # read all data at once (as by spec)
-        d = self._read(_BMP280_REGISTER_DATA, 6)
+        d = self._data
+        self._dev.readinto(_BMP280_REGISTER_DATA, d)
+        self._last_read_ts = now
 
         self._p_raw = (d[0] << 12) + (d[1] << 4) + (d[2] >> 4)
         self._t_raw = (d[3] << 12) + (d[4] << 4) + (d[5] >> 4)
@@ -188,17 +208,13 @@ class BMP280:
                     * self._T3) >> 14
             self._t_fine = var1 + var2
 
-    @property
-    def temperature(self):
-        self._calc_t_fine()
+    def _compensate_t(self):
         if self._t == 0:
             self._t = ((self._t_fine * 5 + 128) >> 8) / 100.
         return self._t
 
-    @property
-    def pressure(self):
+    def _compensate_p(self):
         # From datasheet page 22
-        self._calc_t_fine()
         if self._p == 0:
             var1 = self._t_fine - 128000
             var2 = var1 * var1 * self._P6
@@ -220,6 +236,34 @@ class BMP280:
             self._p = int(p / 100.0) # Convert to hPa
         return int(self._p)
 
+    def read(self):
+        """
+        Temperature [C] and pressure [hPa] of one measurement:
+        a single 6 byte burst read, compensated once.
+        """
+        self._calc_t_fine()
+        return self._compensate_t(), self._compensate_p()
+
+    async def read_async(self):
+        """
+        Async read(). In forced mode a measurement is triggered
+        and its conversion time is awaited instead of blocking.
+        """
+        if self.in_forced_mode:
+            self.force_measure()
+            await asyncio.sleep_ms(self.read_wait_ms)
+        return self.read()
+
+    @property
+    def temperature(self):
+        self._calc_t_fine()
+        return self._compensate_t()
+
+    @property
+    def pressure(self):
+        self._calc_t_fine()
+        return self._compensate_p()
+
     def _write_bits(self, address, value, length, shift=0):
         d = self._read(address)[0]
         m = int('1' * length, 2) << shift
@@ -239,6 +283,8 @@ class BMP280:
     def standby(self, v):
         assert 0 <= v <= 7
         self._write_bits(_BMP280_REGISTER_CONFIG, v, 3, 5)
+        self._standby_ms = _BMP280_STANDBY_MS[v]
+        self._update_read_interval()
 
     @property
     def iir(self):
@@ -284,6 +330,7 @@ class BMP280:
     def power_mode(self, v):
         assert 0 <= v <= 3
         self._write_bits(_BMP280_REGISTER_CONTROL, v, 2)
+        self._mode = v
 
     @property
     def is_measuring(self):
@@ -295,14 +342,20 @@ class BMP280:
 
     @property
     def chip_id(self):
-        return self._read(_BMP280_REGISTER_ID, 1)
+        return bytes(self._read(_BMP280_REGISTER_ID, 1))
 
     @property
     def in_normal_mode(self):
         return self.power_mode == BMP280_POWER_NORMAL
 
+    @property
+    def in_forced_mode(self):
+        """From the last mode set, without a bus transfer"""
+        return self._mode == BMP280_POWER_FORCED
+
     def force_measure(self):
         self.power_mode = BMP280_POWER_FORCED
+        self._last_read_ts = None  # the forced measurement is new data
 
     def normal_measure(self):
         self.power_mode = BMP280_POWER_NORMAL
@@ -316,8 +369,12 @@ class BMP280:
         p_os, t_os, self.read_wait_ms = _BMP280_OS_MATRIX[oss]
         self._write(_BMP280_REGISTER_CONFIG, (iir << 2) + (sb << 5))
         self._write(_BMP280_REGISTER_CONTROL, pm + (p_os << 2) + (t_os << 5))
+        self._mode = pm
+        self._standby_ms = _BMP280_STANDBY_MS[sb]
+        self._update_read_interval()
 
     def oversample(self, oss):
         assert 0 <= oss <= 4
         p_os, t_os, self.read_wait_ms = _BMP280_OS_MATRIX[oss]
-        self._write_bits(_BMP280_REGISTER_CONTROL, p_os + (t_os << 3), 2)
\ No newline at end of file
+        self._write_bits(_BMP280_REGISTER_CONTROL, p_os + (t_os << 3), 2)
+        self._update_read_interval()
\ No newline at end of file
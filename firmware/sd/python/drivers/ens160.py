@@ -1,19 +1,35 @@
 from machine import I2C
+from drivers2.i2c_device import I2CDevice
 
 class ENS160:
+    DATA_STATUS_NEWDAT = 0x02  # DEVICE_STATUS (0x20) bit 1: new AQI/TVOC/eCO2 data
+
     def __init__(self, i2c, address=0x53):
         self.i2c = i2c
         self.address = address
+        self._dev = I2CDevice(i2c, address, 2)
+        # Burst read buffers: 0x20..0x25 (status, AQI, TVOC, eCO2)
+        # and 0x30..0x33 (temperature, humidity used in calculations)
+        self._data = bytearray(6)
+        self._temp_rh = bytearray(4)
+        # Last reading, returned until the sensor has new data
+        self._aqi = None
+        self._tvoc = None
+        self._eco2 = None
+        self._temp = None
+        self._rh = None
+        self._eco2_rating = None
+        self._tvoc_rating = None
         self.set_mode(0x02)
 
     def _read_register(self, reg, length):
-        return self.i2c.readfrom_mem(self.address, reg, length)
+        return self._dev.read(reg, length)
 
     def _write_register(self, reg, data):
         self.i2c.writeto_mem(self.address, reg, data)
 
     def set_mode(self, mode):
-        self._write_register(0x10, bytes([mode]))  # Operating Mode
+        self._dev.write_u8(0x10, mode)  # Operating Mode
 
     def get_id(self):
         data = self._read_register(0x00, 2)  # Device Identity
@@ -84,12 +100,30 @@ class ENS160:
             return "Hazardous"
 
     def read_air_quality(self):
-        aqi = self.get_aqi()
-        tvoc = self.get_tvoc()
-        eco2 = self.get_eco2()
-        temp = self.get_temperature()
-        rh = self.get_humidity()
-        eco2_rating = self.interpret_eco2_level(eco2)
-        tvoc_rating = self.interpret_tvoc_level(tvoc)
-        return aqi, tvoc, eco2, temp, rh, eco2_rating, tvoc_rating
+        """
+        Burst read of 0x20..0x25, the values are decoded only when the
+        NEWDAT bit is set, otherwise the last reading is returned.
+        Ratings are recomputed only when TVOC or eCO2 changes.
+        """
+        data = self._data
+        self._dev.readinto(0x20, data)
+        if data[0] & self.DATA_STATUS_NEWDAT:
+            self._aqi = data[1] & 0x07
+            tvoc = (data[3] << 8) | data[2]  # LSB first, then MSB
+            eco2 = (data[5] << 8) | data[4]
+            if tvoc != self._tvoc:
+                self._tvoc = tvoc
+                self._tvoc_rating = self.interpret_tvoc_level(tvoc)
+            if eco2 != self._eco2:
+                self._eco2 = eco2
+                self._eco2_rating = self.interpret_eco2_level(eco2)
+
+            temp_rh = self._temp_rh
+            self._dev.readinto(0x30, temp_rh)
+            self._temp = ((temp_rh[1] << 8) | temp_rh[0]) / 64.0 - 273.15
+            self._rh = ((temp_rh[3] << 8) | temp_rh[2]) / 512.0
+        return self._aqi, self._tvoc, self._eco2, self._temp, self._rh, self._eco2_rating, self._tvoc_rating
 
+    async def read_async(self):
+        """Async read_air_quality(), the burst read needs no wait"""
+        return self.read_air_quality()
@@ -1,4 +1,5 @@
 import time
+import uasyncio as asyncio
 from micropython import const
 
 
@@ -19,11 +20,15 @@ class SCD4X:
     SET_PRESSURE = const(0x241D)
     GET_ALTITUDE = const(0x2322)
     SET_ALTITUDE = const(0x2427)
+    CMD_DELAY_MS = const(1)  # command execution time of the reads
 
-    def __init__(self, i2c_bus, address=DEFAULT_ADDRESS):
+    def __init__(self, i2c_bus, address=DEFAULT_ADDRESS, stop=True):
         self.i2c = i2c_bus
         self.address = address
         self._buffer = bytearray(18)
+        self._view = memoryview(self._buffer)
+        self._reply = {3: self._view[:3], 9: self._view[:9]}  # reads of exactly the reply length
+        self._cmd_value = self._view[:5]  # command + value + CRC
         self._cmd = bytearray(2)
         self._crc_buffer = bytearray(2)
 
@@ -31,8 +36,11 @@ class SCD4X:
         self._temperature = None
         self._relative_humidity = None
         self._co2 = None
+        self._timestamp = None  # time.ticks_ms() of the cached readings
 
-        self.stop_periodic_measurement()
+        # stop=False: the caller awaits stop() instead of blocking for 500 ms
+        if stop:
+            self.stop_periodic_measurement()
 
     @property
     def co2(self):
@@ -64,28 +72,85 @@ class SCD4X:
             self._read_data()
         return self._relative_humidity
 
+    def read_measurement(self):
+        """Checks data_ready once and reads all three values in one go.
+        Returns (co2, temperature, relative_humidity, timestamp, fresh):
+        timestamp is the time.ticks_ms() of the reading, fresh is False when
+        no new measurement was ready and the cached reading is returned.
+        """
+        fresh = self.data_ready
+        if fresh:
+            self._read_data()
+        return (self._co2, self._temperature, self._relative_humidity, self._timestamp, fresh)
+
+    async def read_async(self):
+        """Async read_measurement(), the command delays don't block the event loop"""
+        self.request_data_ready()
+        await asyncio.sleep_ms(self.CMD_DELAY_MS)
+        fresh = self.read_data_ready()
+        if fresh:
+            self.request_measurement()
+            await asyncio.sleep_ms(self.CMD_DELAY_MS)
+            self.read_measurement_reply()
+        return (self._co2, self._temperature, self._relative_humidity, self._timestamp, fresh)
+
+    # Split transfers: each command is answered CMD_DELAY_MS later, so a
+    # caller sharing the bus can release it while the sensor is busy.
+
+    def request_data_ready(self):
+        self._send_command(self.DATA_READY)
+
+    def read_data_ready(self):
+        """Reply of request_data_ready() -> True if a new measurement is ready"""
+        self._read_reply(3)
+        return self._is_data_ready()
+
+    def request_measurement(self):
+        self._send_command(self.READ_MEASUREMENT)
+
+    def read_measurement_reply(self):
+        """Reply of request_measurement() -> (co2, temperature, relative_humidity, timestamp)"""
+        self._read_reply(9)
+        self._decode_measurement()
+        return (self._co2, self._temperature, self._relative_humidity, self._timestamp)
+
+    async def stop(self):
+        """Async stop_periodic_measurement()"""
+        await self._send_command_async(self.STOP_PERIODIC_MEASUREMENT, cmd_delay_ms=500)
+
+    async def start(self):
+        """Async start_periodic_measurement()"""
+        await self._send_command_async(self.START_PERIODIC_MEASUREMENT, cmd_delay_ms=10)
+
     def _read_data(self):
         """Reads the temp/hum/co2 from the sensor and caches it"""
         self._send_command(self.READ_MEASUREMENT, cmd_delay=0.001)
-        self._read_reply(self._buffer, 9)
+        self._read_reply(9)
+        self._decode_measurement()
+
+    def _decode_measurement(self):
         self._co2 = (self._buffer[0] << 8) | self._buffer[1]
         temp = (self._buffer[3] << 8) | self._buffer[4]
         self._temperature = -45 + 175 * (temp / 2 ** 16)
         humi = (self._buffer[6] << 8) | self._buffer[7]
         self._relative_humidity = 100 * (humi / 2 ** 16)
+        self._timestamp = time.ticks_ms()
 
     @property
     def data_ready(self):
         """Check the sensor to see if new data is available"""
         self._send_command(self.DATA_READY, cmd_delay=0.001)
-        self._read_reply(self._buffer, 3)
+        self._read_reply(3)
+        return self._is_data_ready()
+
+    def _is_data_ready(self):
         return not ((self._buffer[0] & 0x03 == 0) and (self._buffer[1] == 0))
 
     @property
     def serial_number(self):
         """Request a 6-tuple containing the unique serial number for this sensor"""
         self._send_command(self.SERIAL_NUMBER, cmd_delay=0.001)
-        self._read_reply(self._buffer, 9)
+        self._read_reply(9)
         return (
             self._buffer[0],
             self._buffer[1],
@@ -112,7 +177,7 @@ class SCD4X:
             persist_settings().
         """
         self._send_command(self.GET_ALTITUDE, cmd_delay=0.001)
-        self._read_reply(self._buffer, 3)
+        self._read_reply(3)
         return (self._buffer[0] << 8) | self._buffer[1]
 
     def set_altitude(self, height):
@@ -141,21 +206,28 @@ class SCD4X:
         self.i2c.writeto(self.address, self._cmd)
         time.sleep(cmd_delay)
 
+    async def _send_command_async(self, cmd, cmd_delay_ms=0):
+        self._cmd[0] = (cmd >> 8) & 0xFF
+        self._cmd[1] = cmd & 0xFF
+        self.i2c.writeto(self.address, self._cmd)
+        await asyncio.sleep_ms(cmd_delay_ms)
+
     def _set_command_value(self, cmd, value, cmd_delay=0):
         self._buffer[0] = (cmd >> 8) & 0xFF
         self._buffer[1] = cmd & 0xFF
         self._crc_buffer[0] = self._buffer[2] = (value >> 8) & 0xFF
         self._crc_buffer[1] = self._buffer[3] = value & 0xFF
         self._buffer[4] = self._crc8(self._crc_buffer)
-        self.i2c.writeto(self.address, self._buffer[:5])
+        self.i2c.writeto(self.address, self._cmd_value)
         time.sleep(cmd_delay)
 
-    def _read_reply(self, buff, num):
-        self.i2c.readfrom_into(self.address, buff, num)
-        self._check_buffer_crc(self._buffer[0:num])
+    def _read_reply(self, num):
+        # readfrom_into() reads len(buf) bytes: read into a view of the reply length
+        self.i2c.readfrom_into(self.address, self._reply[num])
+        self._check_buffer_crc(self._buffer, num)
 
-    def _check_buffer_crc(self, buf):
-        for i in range(0, len(buf), 3):
+    def _check_buffer_crc(self, buf, num):
+        for i in range(0, num, 3):
             self._crc_buffer[0] = buf[i]
             self._crc_buffer[1] = buf[i + 1]
             if self._crc8(self._crc_buffer) != buf[i + 2]:
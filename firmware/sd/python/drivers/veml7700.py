@@ -1,6 +1,7 @@
 from machine import I2C, Pin
 import time
 from micropython import const
+from drivers2.i2c_device import I2CDevice
 
 #start const
 # default address
@@ -61,6 +62,7 @@ class VEML7700:
         if i2c is None:
             raise ValueError('An I2C object is required.')
         self.i2c = i2c
+        self._dev = I2CDevice(i2c, address, 2)
 
         confValuesForIt = confValues.get(it)
         gainValuesForIt = gainValues.get(it)
@@ -104,13 +106,15 @@ class VEML7700:
         # Reading at a faster frequency will not cause an error, but
         # will result in reading the previous data
 
-        self.lux = bytearray(2)
-        
         #time.sleep(.04)  # 40ms
 
-        self.i2c.readfrom_mem_into(self.address, als, self.lux)
-        self.lux = self.lux[0]+self.lux[1]*256
-        self.lux = self.lux * self.gain
+        self.lux = self._dev.read_u16_le(als) * self.gain
         return self.lux
+
+    async def read_async(self):
+        """ Async read_lux(), the sensor integrates continuously so there
+            is nothing to wait for.
+        """
+        return self.read_lux()
         
     
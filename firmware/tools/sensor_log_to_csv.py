@@ -0,0 +1,169 @@
+"""
+Host-side converter: binary sensor log segments (/sd/logs/YYYY-MM-DD.bin or .bad)
+back to the CSV format the device used to write (/sd/sensor_logs.csv), and
+rollup tiers (/sd/logs/1h.rlp, 1d.rlp) to min/max/mean CSV.
+
+Usage:
+    python sensor_log_to_csv.py logs/*.bin > sensor_logs.csv
+    python sensor_log_to_csv.py -o sensor_logs.csv logs/2026-10-17.bin logs/2026-10-18.bin
+    python sensor_log_to_csv.py --rollup logs/1h.rlp > hourly.csv
+
+Runs on the PC with regular CPython, keep the format in sync with
+firmware/flash/services/storage_task.py.
+"""
+import argparse
+import binascii
+import struct
+import sys
+import time
+
+CSV_HEADER = "timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux\n"
+
+LOG_MAGIC = b"CO2L"
+
+# Record layout per log version
+RECORD_FMTS = {
+    1: "<IhHHHHBBII",
+    2: "<IhHHHHBBIIHH",   # + crc, commit marker
+}
+RECORD_COMMIT = 0xA55A
+
+ROLLUP_MAGIC = b"CO2R"
+ROLLUP_FMT = "<IH" + "hHHHHBII" * 3 + "HH"
+ROLLUP_METRICS = ("temperature", "humidity", "co2", "eco2", "tvoc", "aqi", "pressure", "lux")
+ROLLUP_SCALES = (100, 100, 1, 1, 1, 1, 100, 100)
+ROLLUP_CSV_HEADER = "timestamp,count," + ",".join(
+    "{}_{}".format(name, stat) for stat in ("min", "max", "mean") for name in ROLLUP_METRICS
+) + "\n"
+
+# MicroPython on the STM32 counts seconds from 2000-01-01 instead of 1970-01-01
+EPOCH_2000 = 946684800
+
+
+def _format_timestamp(ts):
+    """
+    Device timestamp -> 'YYYY-MM-DD HH:MM:SS'
+    The RTC runs on local time, so no timezone conversion is done.
+    """
+    t = time.gmtime(ts + EPOCH_2000)
+    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(
+        t[0], t[1], t[2], t[3], t[4], t[5]
+    )
+
+
+def read_records(path):
+    """
+    Yield (ts, temperature, humidity, co2, eco2, tvoc, aqi, pressure, lux)
+    for every record of one segment file. Torn records (bad CRC or commit
+    marker, version 2 and up) are skipped.
+    """
+    with open(path, "rb") as f:
+        head = f.read(6)
+        if len(head) < 6 or head[0:4] != LOG_MAGIC:
+            raise ValueError("{}: not a sensor log segment".format(path))
+
+        version = head[4]
+        record_size = head[5]
+        fmt = RECORD_FMTS.get(version)
+        if fmt is None or struct.calcsize(fmt) != record_size:
+            raise ValueError("{}: unsupported log version {}".format(path, version))
+
+        # header is padded to one record
+        f.seek(record_size)
+
+        while True:
+            rec = f.read(record_size)
+            if len(rec) < record_size:
+                break
+            fields = struct.unpack(fmt, rec)
+            if version >= 2:
+                crc, commit = fields[10:12]
+                if commit != RECORD_COMMIT or binascii.crc32(rec[:-4]) & 0xFFFF != crc:
+                    print("{}: skipped torn record at offset {}".format(path, f.tell() - record_size), file=sys.stderr)
+                    continue
+            ts, temp, hum, co2, eco2, tvoc, aqi, _, pressure, lux = fields[0:10]
+            yield (ts, temp / 100, hum / 100, co2, eco2, tvoc, aqi, pressure / 100, lux / 100)
+
+
+def read_rollups(path):
+    """
+    Yield (window start, count, min, max, mean) for every record of a rollup
+    file, min/max/mean are tuples in ROLLUP_METRICS order. Torn records are skipped.
+    """
+    size = struct.calcsize(ROLLUP_FMT)
+    with open(path, "rb") as f:
+        head = f.read(size)
+        if len(head) < size or head[0:4] != ROLLUP_MAGIC or head[5] != size:
+            raise ValueError("{}: not a rollup file".format(path))
+
+        while True:
+            rec = f.read(size)
+            if len(rec) < size:
+                break
+            fields = struct.unpack(ROLLUP_FMT, rec)
+            crc, commit = fields[-2:]
+            if commit != RECORD_COMMIT or binascii.crc32(rec[:-4]) & 0xFFFF != crc:
+                print("{}: skipped torn record at offset {}".format(path, f.tell() - size), file=sys.stderr)
+                continue
+            n = len(ROLLUP_METRICS)
+            values = [fields[2 + i] / ROLLUP_SCALES[i % n] for i in range(3 * n)]
+            yield (fields[0], fields[1], tuple(values[0:n]), tuple(values[n:2 * n]), tuple(values[2 * n:]))
+
+
+def format_rollup_row(rollup):
+    ts, count, lo, hi, mean = rollup
+    return "{},{:d},{}\n".format(
+        _format_timestamp(ts),
+        count,
+        ",".join("{:.2f}".format(v) for v in lo + hi + mean),
+    )
+
+
+def format_row(record):
+    ts, temp, hum, co2, eco2, tvoc, aqi, pressure, lux = record
+    return "{},{:.2f},{:.2f},{:d},{:d},{:d},{:d},{:.2f},{:.2f}\n".format(
+        _format_timestamp(ts),
+        temp,
+        hum,
+        co2,
+        eco2,
+        tvoc,
+        aqi,
+        pressure,
+        lux,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert binary sensor log segments to CSV.")
+    parser.add_argument("segments", nargs="+", help="segment files (.bin), converted in date (file name) order")
+    parser.add_argument("-o", "--output", help="output CSV file, stdout if omitted")
+    parser.add_argument("--rollup", action="store_true", help="inputs are rollup files (.rlp)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.rollup:
+            out.write(ROLLUP_CSV_HEADER)
+            for path in args.segments:
+                try:
+                    for rollup in read_rollups(path):
+                        out.write(format_rollup_row(rollup))
+                except ValueError as e:
+                    print("{}, skipped".format(e), file=sys.stderr)
+        else:
+            out.write(CSV_HEADER)
+            # One unreadable file (e.g. a .bad segment) doesn't stop the export
+            for path in sorted(args.segments):
+                try:
+                    for record in read_records(path):
+                        out.write(format_row(record))
+                except ValueError as e:
+                    print("{}, skipped".format(e), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
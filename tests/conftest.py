@@ -0,0 +1,40 @@
+"""
+Host-side tests of the pure Python firmware modules with CPython.
+The MicroPython modules they import are replaced by small shims.
+"""
+import asyncio
+import calendar
+import os
+import struct
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ("firmware/flash", "firmware/flash/services", "firmware/sd/python", "firmware/tools"):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+# uasyncio is asyncio, the hardware modules are never used by the tested code
+sys.modules.setdefault("uasyncio", asyncio)
+sys.modules.setdefault("utime", time)
+sys.modules.setdefault("ustruct", struct)
+sys.modules.setdefault("pyb", types.ModuleType("pyb"))
+machine = types.ModuleType("machine")
+machine.Pin = machine.I2C = machine.RTC = object
+sys.modules.setdefault("machine", machine)
+micropython = types.ModuleType("micropython")
+micropython.const = lambda x: x
+sys.modules.setdefault("micropython", micropython)
+
+# The device RTC runs on local time without a timezone
+os.environ["TZ"] = "UTC"
+time.tzset()
+# MicroPython's mktime() takes 8-tuples and returns an int
+time.mktime = lambda t: calendar.timegm(tuple(t[:6]))
+
+# MicroPython time.ticks_*, without the wrap-around
+if not hasattr(time, "ticks_ms"):
+    time.ticks_ms = lambda: int(time.monotonic() * 1000)
+    time.ticks_us = lambda: int(time.monotonic() * 1000000)
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
@@ -0,0 +1,91 @@
+import pytest
+
+from clock_window import ClockWindow
+
+
+def test_windows_are_aligned_to_the_clock():
+    clock = ClockWindow(("x",), [60, 300])
+    assert clock.add(125, [1]) == 0
+    assert clock.end == [180, 300]
+    clock.add(179, [3])
+    # The first window is 120..180 even though sampling started at 125
+    assert clock.add(180, [5]) == 1
+    assert clock.record_ts[0] == 120
+    assert clock.record[0] == [2.0]
+    assert clock.seq == [1, 0]
+
+
+def test_closed_windows_fold_into_the_next_level():
+    clock = ClockWindow(("x",), [60, 300])
+    for t in range(0, 301, 30):
+        closed = clock.add(t, [t])
+    assert closed == 0b11
+    assert clock.record_ts[1] == 0
+    # Every sample of 0..300 once, the last one opens the next window
+    assert clock.record[1] == [sum(range(0, 300, 30)) / 10]
+
+
+def test_window_without_samples_is_none():
+    clock = ClockWindow(("x", "y"), [60])
+    clock.add(0, [1, None])
+    clock.add(60, [None, None])
+    assert clock.record[0] == [1.0, None]
+
+
+def test_clock_jump_closes_once_and_realigns():
+    clock = ClockWindow(("x",), [60])
+    clock.add(10, [1])
+    assert clock.add(1000, [2]) == 1
+    assert clock.seq == [1]
+    assert clock.record_ts[0] == 0
+    assert clock.end == [1020]
+
+
+def test_missed_windows_stay_queued():
+    clock = ClockWindow(("x",), [60], depth=4)
+    for t in range(0, 6 * 60 + 1, 60):
+        clock.add(t, [t])
+    assert clock.seq == [6]
+    # A consumer that last saw seq 0 gets the windows still queued
+    assert clock.closed(0, 1) is None
+    assert clock.closed(0, 2) is None
+    assert clock.closed(0, 3) == (120, [120.0])
+    assert clock.closed(0, 6) == (300, [300.0])
+    assert clock.closed(0, 7) is None
+
+
+def test_periods_must_be_multiples():
+    with pytest.raises(AssertionError):
+        ClockWindow(("x",), [60, 90])
+
+
+def test_level_of_an_unknown_period():
+    clock = ClockWindow(("x",), [60, 300])
+    assert clock.level(300) == 1
+    with pytest.raises(AssertionError):
+        clock.level(120)
+
+
+def test_clock_set_backwards_drops_the_windows_in_progress():
+    clock = ClockWindow(("x",), [60, 300])
+    clock.add(600, [100])
+    clock.add(630, [100])
+    # NTP correction: back by 2 minutes, into an earlier 5 min window
+    assert clock.add(500, [10]) == 0
+    assert clock.end == [540, 600]
+    assert clock.seq == [0, 0]
+    clock.add(530, [20])
+    assert clock.add(540, [30]) == 1
+    assert clock.record[0] == [15.0]
+    clock.add(600, [None])
+    assert clock.record_ts[1] == 300
+    assert clock.record[1] == [20.0]
+
+
+def test_clock_set_back_within_the_window_keeps_it():
+    clock = ClockWindow(("x",), [60])
+    clock.add(610, [1])
+    clock.add(650, [2])
+    clock.add(620, [3])
+    clock.add(660, [None])
+    assert clock.record[0] == [2.0]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import i2c_bus
+from i2c_bus import I2CBus, PRIO_HIGH, PRIO_NORMAL, PRIO_LOW
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_hold_returns_the_i2c_object():
+    async def main():
+        bus = I2CBus("i2c")
+        async with bus.hold(PRIO_LOW) as i2c:
+            assert i2c == "i2c"
+            assert bus._busy
+        assert not bus._busy
+    _run(main())
+
+
+def test_waiters_get_the_bus_by_priority_then_arrival():
+    order = []
+
+    async def user(bus, name, prio):
+        async with bus.hold(prio):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        bus = I2CBus(None)
+        await bus.acquire(PRIO_LOW)
+        tasks = [asyncio.create_task(user(bus, name, prio)) for name, prio in
+                 (("sensor1", PRIO_LOW), ("rtc", PRIO_NORMAL), ("sensor2", PRIO_LOW),
+                  ("led", PRIO_HIGH), ("rtc2", PRIO_NORMAL))]
+        await asyncio.sleep(0)
+        assert bus.depth() == 5
+        assert bus.max_depth == 5
+        bus.release()
+        await asyncio.gather(*tasks)
+        assert not bus._busy
+    _run(main())
+    assert order == ["led", "rtc", "rtc2", "sensor1", "sensor2"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        bus = I2CBus(None)
+        await bus.acquire()
+        waiter = asyncio.create_task(bus.acquire(PRIO_HIGH))
+        await asyncio.sleep(0)
+        assert bus.depth() == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert bus.depth() == 0
+        bus.release()
+        assert not bus._busy
+    _run(main())
+
+
+def test_bus_granted_while_cancelled_goes_to_the_next_waiter(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(i2c_bus.time, "ticks_us", lambda: now[0])
+
+    async def main():
+        bus = I2CBus(None)
+        await bus.acquire()
+        first = asyncio.create_task(bus.acquire(PRIO_HIGH))
+        second = asyncio.create_task(bus.acquire(PRIO_LOW))
+        await asyncio.sleep(0)
+        now[0] = 1000
+        bus.release()          # hands the bus to `first` ...
+        first.cancel()         # ... which is cancelled before it runs
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await second
+        assert bus._busy and bus.depth() == 0
+        # The first holder's 1 ms is counted once, not again by the hand-off
+        assert bus._busy_us == 1000
+        bus.release()
+        assert not bus._busy
+    _run(main())
+
+
+def test_utilisation_over_a_window(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(i2c_bus.time, "ticks_us", lambda: now[0])
+
+    async def main():
+        bus = I2CBus(None)
+        await bus.acquire()
+        now[0] = 2500
+        bus.release()
+        now[0] = 10000
+        assert bus.utilisation() == pytest.approx(0.25)
+        # A transaction in progress counts up to now, the rest goes to the next window
+        await bus.acquire()
+        now[0] = 12000
+        assert bus.utilisation() == pytest.approx(1.0)
+        now[0] = 14000
+        bus.release()
+        now[0] = 20000
+        assert bus.utilisation() == pytest.approx(0.25)
+    _run(main())
@@ -0,0 +1,64 @@
+import errno
+import sys
+import types
+
+import pytest
+
+import shared_variables as var
+
+# drv2605 uses typing annotations that only MicroPython ignores, the
+# presence logic doesn't need it
+sys.modules.setdefault("drivers2.drv2605", types.ModuleType("drivers2.drv2605"))
+import i2c_task  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def status(monkeypatch):
+    data = var.system_data
+    monkeypatch.setattr(data, "i2c_present", 0)
+    monkeypatch.setattr(data, "i2c_checked", 0)
+    monkeypatch.setattr(data, "i2c_status_version", 0)
+    i2c_task._rescan.clear()
+    return data
+
+
+def _bit(name):
+    return i2c_task._DEVICE_BIT[name]
+
+
+def test_successful_transaction_marks_the_device_present(status):
+    i2c_task._set_present("SCD41", True)
+    assert status.i2c_present & _bit("SCD41")
+    assert status.i2c_checked & _bit("SCD41")
+    assert status.i2c_status_version == 1
+    # No change, no new status version
+    i2c_task._set_present("SCD41", True)
+    assert status.i2c_status_version == 1
+    assert not i2c_task._rescan.is_set()
+
+
+@pytest.mark.parametrize("code", [errno.EIO, errno.ENODEV, errno.ETIMEDOUT])
+def test_bus_errors_clear_presence_and_ask_for_a_rescan(status, code):
+    i2c_task._set_present("SCD41", True)
+    i2c_task._device_failed("SCD41", OSError(code))
+    assert not status.i2c_present & _bit("SCD41")
+    assert i2c_task._rescan.is_set()
+
+
+@pytest.mark.parametrize("error", [RuntimeError("CRC check failed while reading data"),
+                                   ValueError("bad value"),
+                                   OSError(errno.EINVAL)])
+def test_driver_errors_keep_the_device_present(status, error):
+    i2c_task._set_present("SCD41", True)
+    version = status.i2c_status_version
+    i2c_task._device_failed("SCD41", error)
+    assert status.i2c_present & _bit("SCD41")
+    assert status.i2c_status_version == version
+    assert not i2c_task._rescan.is_set()
+
+
+def test_scan_result_does_not_ask_for_a_rescan(status):
+    i2c_task._set_present("ENS160", False, rescan=False)
+    assert status.i2c_checked & _bit("ENS160")
+    assert not status.i2c_present & _bit("ENS160")
+    assert not i2c_task._rescan.is_set()
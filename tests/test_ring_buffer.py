@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from ring_buffer import RingBuffer
+
+
+def test_empty_max_is_default():
+    ring = RingBuffer(4, track_max=True)
+    assert ring.max() == 0
+    assert ring.max(default=-1) == -1
+
+
+def test_keeps_the_newest_samples_in_order():
+    ring = RingBuffer(3, track_max=True)
+    for v in (1, 2, 3, 4, 5):
+        ring.append(v)
+    assert len(ring) == 3
+    assert list(ring) == [3, 4, 5]
+    assert ring[0] == 3 and ring[-1] == 5
+
+
+@pytest.mark.parametrize("track_max", [True, False])
+def test_max_matches_the_window_maximum(track_max):
+    rng = random.Random(1)
+    for capacity in (1, 2, 5, 16):
+        ring = RingBuffer(capacity, track_max=track_max)
+        window = []
+        for _ in range(500):
+            v = rng.randrange(0, 50)   # small range, many equal samples
+            ring.append(v)
+            window = (window + [v])[-capacity:]
+            assert ring.max() == max(window)
+            assert list(ring) == window
+
+
+def test_max_of_a_descending_run_drops_the_expired_maximum():
+    ring = RingBuffer(3, track_max=True)
+    for v in (9, 8, 7, 6, 5):
+        ring.append(v)
+    assert ring.max() == 7
+
+
+def test_clear_resets_the_maximum():
+    ring = RingBuffer(4, track_max=True)
+    for v in (10, 20, 30):
+        ring.append(v)
+    ring.clear()
+    assert len(ring) == 0
+    assert ring.max() == 0
+    ring.append(5)
+    ring.append(3)
+    assert list(ring) == [5, 3]
+    assert ring.max() == 5
+
+
+def test_untracked_ring_has_no_deque():
+    ring = RingBuffer(10, "h")
+    assert ring.ram_bytes() == 10 * 2
+    assert RingBuffer(10, "h", track_max=True).ram_bytes() == 10 * (2 + 4)
+    assert ring.max(default=-1) == -1
+    for v in (-5, -3, -9):
+        ring.append(v)
+    assert ring.max() == -3
@@ -0,0 +1,99 @@
+import pytest
+
+from rolling_stats import RollingStats
+
+FIELDS = (("x", 0, 120),)   # 12 histogram bins of 10
+
+
+def test_no_samples_yet():
+    stats = RollingStats(FIELDS, (("w", 1, 3),))
+    assert stats.summary(0, 0) is None
+    stats.add([None], now_ms=0)
+    assert stats.summary(0, 0) is None
+
+
+def test_mean_variance_min_max():
+    stats = RollingStats(FIELDS, (("w", 10, 6),))
+    for v in (10, 20, 30, 40):
+        stats.add([v], now_ms=0)
+    count, mean, variance, lo, hi, _, _ = stats.summary(0, 0)
+    assert count == 4
+    assert mean == pytest.approx(25)
+    assert variance == pytest.approx(125)
+    assert (lo, hi) == (10, 40)
+
+
+def test_bucket_rollover_drops_the_oldest_bucket():
+    stats = RollingStats(FIELDS, (("w", 1, 3),))
+    stats.add([10], now_ms=0)
+    stats.add([20], now_ms=1000)
+    stats.add([30], now_ms=2000)
+    assert stats.summary(0, 0)[0] == 3
+    # The bucket of t=0 leaves the 3 s window
+    stats.add([40], now_ms=3000)
+    count, mean, _, lo, hi, _, _ = stats.summary(0, 0)
+    assert count == 3
+    assert mean == pytest.approx(30)
+    assert (lo, hi) == (20, 40)
+
+
+def test_long_pause_clears_every_bucket():
+    stats = RollingStats(FIELDS, (("w", 1, 3),))
+    stats.add([10], now_ms=0)
+    stats.add([20], now_ms=1000)
+    stats.add([None], now_ms=60000)
+    assert stats.summary(0, 0) is None
+
+
+def test_percentiles_of_a_uniform_distribution():
+    stats = RollingStats(FIELDS, (("w", 60, 2),))
+    for v in range(100):
+        stats.add([v], now_ms=0)
+    _, _, _, lo, hi, p50, p95 = stats.summary(0, 0)
+    assert p50 == pytest.approx(50, abs=1)
+    assert p95 == pytest.approx(95, abs=1)
+    assert lo <= p50 <= p95 <= hi
+
+
+def test_percentiles_are_clamped_to_min_max():
+    stats = RollingStats(FIELDS, (("w", 60, 2),))
+    for _ in range(10):
+        stats.add([42], now_ms=0)
+    _, _, _, _, _, p50, p95 = stats.summary(0, 0)
+    assert p50 == 42 and p95 == 42
+
+
+def test_window_index():
+    stats = RollingStats(FIELDS, (("5m", 10, 30), ("1h", 120, 30)))
+    assert stats.window_index("1h") == 1
+    with pytest.raises(ValueError):
+        stats.window_index("24h")
+
+
+def test_variance_of_a_full_bucket_in_float32():
+    # 24 h window bucket: 3600 CO2 samples far from the middle of the range,
+    # the buckets are float32 arrays like on the board
+    stats = RollingStats((("co2", 400, 2800),), (("24h", 7200, 12),))
+    values = [1000 + (i % 11) - 5 for i in range(3600)]
+    for v in values:
+        stats.add([v], now_ms=0)
+    count, mean, variance, _, _, _, _ = stats.summary(0, 0)
+    exact_mean = sum(values) / len(values)
+    exact_var = sum((v - exact_mean) ** 2 for v in values) / len(values)
+    assert count == 3600
+    assert mean == pytest.approx(exact_mean, abs=0.01)
+    assert variance == pytest.approx(exact_var, rel=0.01)
+
+
+def test_buckets_merge_to_the_variance_of_all_samples():
+    stats = RollingStats(FIELDS, (("w", 1, 4),))
+    samples = ((0, [10, 12]), (1000, [50, 54, 58]), (2000, [90]))
+    for now_ms, values in samples:
+        for v in values:
+            stats.add([v], now_ms=now_ms)
+    every = [v for _, values in samples for v in values]
+    mean = sum(every) / len(every)
+    count, m, variance, _, _, _, _ = stats.summary(0, 0)
+    assert count == len(every)
+    assert m == pytest.approx(mean)
+    assert variance == pytest.approx(sum((v - mean) ** 2 for v in every) / len(every))
@@ -0,0 +1,76 @@
+import binascii
+import struct
+
+import pytest
+
+import sensor_log_to_csv as conv
+
+FIELDS = (2137, 4550, 812, 400, 25, 2, 0, 101325, 12345)
+
+
+def _header(version, size):
+    return conv.LOG_MAGIC + bytes([version, size]) + bytes(size - 6)
+
+
+def _v1_record(ts):
+    return struct.pack(conv.RECORD_FMTS[1], ts, *FIELDS)
+
+
+def _v2_record(ts):
+    rec = bytearray(struct.pack(conv.RECORD_FMTS[2], ts, *FIELDS, 0, conv.RECORD_COMMIT))
+    struct.pack_into("<H", rec, len(rec) - 4, binascii.crc32(rec[:-4]) & 0xFFFF)
+    return bytes(rec)
+
+
+def _expected(ts):
+    return (ts, 21.37, 45.5, 812, 400, 25, 2, 1013.25, 123.45)
+
+
+def test_version_1_segment(tmp_path):
+    path = tmp_path / "2026-10-17.bin"
+    path.write_bytes(_header(1, 24) + _v1_record(300) + _v1_record(600))
+    assert list(conv.read_records(str(path))) == [_expected(300), _expected(600)]
+
+
+def test_version_2_segment_skips_torn_records(tmp_path):
+    torn = bytearray(_v2_record(600))
+    torn[-2:] = b"\x00\x00"           # commit marker never written
+    corrupt = bytearray(_v2_record(900))
+    corrupt[4] ^= 0xFF                # data doesn't match the CRC
+    path = tmp_path / "2026-10-18.bin"
+    path.write_bytes(_header(2, 28) + _v2_record(300) + bytes(torn) + bytes(corrupt)
+                     + _v2_record(1200) + b"\x01\x02")   # half written last record
+    assert list(conv.read_records(str(path))) == [_expected(300), _expected(1200)]
+
+
+def test_unsupported_version(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(_header(3, 28))
+    with pytest.raises(ValueError):
+        list(conv.read_records(str(path)))
+
+
+def test_not_a_segment(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"timestamp,temperature\n")
+    with pytest.raises(ValueError):
+        list(conv.read_records(str(path)))
+
+
+def test_format_row():
+    # Device time counts from 2000-01-01
+    assert conv.format_row(_expected(86400 + 3661)) == \
+        "2000-01-02 01:01:01,21.37,45.50,812,400,25,2,1013.25,123.45\n"
+
+
+def test_export_skips_unreadable_segments(tmp_path, capsys):
+    good = tmp_path / "2026-10-17.bin"
+    good.write_bytes(_header(2, 28) + _v2_record(300))
+    bad = tmp_path / "2026-10-18.bad"
+    bad.write_bytes(b"garbage that is no segment header")
+    out = tmp_path / "out.csv"
+    conv.main(["-o", str(out), str(good), str(bad)])
+    lines = out.read_text().splitlines()
+    assert lines[0] + "\n" == conv.CSV_HEADER
+    assert len(lines) == 2
+    assert "2026-10-18.bad: not a sensor log segment, skipped" in capsys.readouterr().err
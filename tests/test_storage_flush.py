@@ -0,0 +1,144 @@
+import asyncio
+import os
+import struct
+import time
+
+import pytest
+
+import storage_task as st
+
+DAY = 86400
+
+
+def _fill(rows, day, first, count):
+    for i in range(first, first + count):
+        st._pack_record(rows.slot(), day * DAY + i * 300, (20, 50, 400 + i, 0, 0, 1, 1000, 5))
+
+
+def _segment(log_dir, day):
+    return st._segment_path(str(log_dir), time.localtime(day * DAY))
+
+
+def _log_timestamps(path):
+    """Timestamps of the valid records of one segment file."""
+    with open(path + st.LOG_EXT, "rb") as f:
+        data = f.read()
+    assert data[:st.RECORD_SIZE] == st.LOG_HEADER
+    assert len(data) % st.RECORD_SIZE == 0
+    return [struct.unpack_from("<I", data, o)[0]
+            for o in range(st.RECORD_SIZE, len(data), st.RECORD_SIZE)
+            if st._record_ok(data, o)]
+
+
+def _flush(log_dir, rows, active=None):
+    return asyncio.run(st._flush_rows(str(log_dir), rows, active, 7, st.log))
+
+
+@pytest.fixture
+def failing_write(monkeypatch):
+    """
+    Make the n-th _sd_write() of a log segment write `keep` bytes and raise.
+    """
+    real = st._sd_write
+
+    def install(n, keep):
+        calls = [0]
+
+        def write(f, data):
+            if getattr(f, "name", "").endswith(st.LOG_EXT) and len(data) != st.RECORD_SIZE:
+                calls[0] += 1
+                if calls[0] == n:
+                    f.write(bytes(data[:keep]))
+                    raise OSError(5)
+            return real(f, data)
+
+        monkeypatch.setattr(st, "_sd_write", write)
+
+    return install
+
+
+def test_flush_writes_and_pops_every_row(tmp_path):
+    rows = st.RowBuffer(64)
+    _fill(rows, 10, 0, 40)
+    active = _flush(tmp_path, rows)
+    path = _segment(tmp_path, 10)
+    assert active == path
+    assert rows.count == 0
+    assert _log_timestamps(path) == [10 * DAY + i * 300 for i in range(40)]
+    # Hour index: the first record of every hour
+    assert list(st._read_index(path))[:4] == [0, 12, 24, 36]
+
+
+def test_rows_of_two_days_go_to_their_segments(tmp_path):
+    rows = st.RowBuffer(64)
+    _fill(rows, 10, 280, 8)   # 23:20 .. 23:55
+    _fill(rows, 11, 0, 3)
+    active = _flush(tmp_path, rows)
+    assert active == _segment(tmp_path, 11)
+    assert len(_log_timestamps(_segment(tmp_path, 10))) == 8
+    assert len(_log_timestamps(_segment(tmp_path, 11))) == 3
+
+
+def test_partial_write_keeps_the_unwritten_rows(tmp_path, failing_write):
+    rows = st.RowBuffer(64)
+    _fill(rows, 10, 0, 40)
+    chunk = st.RECORD_CHUNK // st.RECORD_SIZE
+    failing_write(2, 10)           # second chunk: 10 bytes, then an error
+    with pytest.raises(OSError):
+        _flush(tmp_path, rows)
+    path = _segment(tmp_path, 10)
+    assert rows.count == 40 - chunk
+    assert rows.torn_path == path
+
+    # The next flush pads the torn record and appends the rest once
+    failing_write(0, 0)
+    _flush(tmp_path, rows, path)
+    assert rows.count == 0
+    assert _log_timestamps(path) == [10 * DAY + i * 300 for i in range(40)]
+
+
+def test_records_written_before_the_error_are_not_repeated(tmp_path, failing_write):
+    rows = st.RowBuffer(64)
+    _fill(rows, 10, 0, 10)
+    failing_write(1, st.RECORD_CHUNK)   # the whole chunk reached the card, then an error
+    with pytest.raises(OSError):
+        _flush(tmp_path, rows)
+    path = _segment(tmp_path, 10)
+    assert rows.count == 0
+    assert rows.torn_path is None
+    assert _log_timestamps(path) == [10 * DAY + i * 300 for i in range(10)]
+
+
+def test_torn_tail_is_repaired_in_the_segment_that_failed(tmp_path, failing_write):
+    rows = st.RowBuffer(4)
+    _fill(rows, 10, 0, 2)
+    failing_write(1, st.RECORD_SIZE + 10)
+    with pytest.raises(OSError):
+        _flush(tmp_path, rows)
+    day10 = _segment(tmp_path, 10)
+    assert rows.torn_path == day10
+
+    # The unwritten row of day 10 is dropped by a full buffer of day 11 rows
+    _fill(rows, 11, 0, 4)
+    failing_write(0, 0)
+    _flush(tmp_path, rows, day10)
+    assert _log_timestamps(day10) == [10 * DAY]
+    day11 = _segment(tmp_path, 11)
+    assert _log_timestamps(day11) == [11 * DAY + i * 300 for i in range(4)]
+    assert os.path.getsize(day11 + st.LOG_EXT) == 5 * st.RECORD_SIZE
+
+
+def test_age_follows_the_oldest_remaining_row(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(st.time, "ticks_ms", lambda: now[0])
+    rows = st.RowBuffer(8)
+    assert rows.age_s() == 0
+    _fill(rows, 10, 0, 1)
+    now[0] = 60000
+    _fill(rows, 10, 1, 1)
+    now[0] = 90000
+    assert rows.age_s() == 90
+    rows.pop(1)
+    assert rows.age_s() == 30
+    rows.pop(1)
+    assert rows.age_s() == 0
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import struct
+import time
+
+import storage_task as st
+
+DAY = 86400
+
+
+def _write_segment(log_dir, day, stamps, torn=()):
+    """Day segment with one record per timestamp, the ones in `torn` without commit marker."""
+    path = st._segment_path(str(log_dir), time.localtime(day * DAY))
+    rec = bytearray(st.RECORD_SIZE)
+    with open(path + st.LOG_EXT, "wb") as f:
+        f.write(st.LOG_HEADER)
+        for ts in stamps:
+            st._pack_record(rec, ts, (20, 50, ts % 1000, 0, 0, 1, 1000, 5))
+            if ts in torn:
+                rec[-2:] = b"\x00\x00"
+            f.write(rec)
+    return path
+
+
+def _range(log_dir, t1, t2, block=4):
+    out = []
+    buf = bytearray(block * st.RECORD_SIZE)
+    n = asyncio.run(st._read_log_range(str(log_dir), t1, t2, buf,
+                                       lambda b, o: out.append(struct.unpack_from("<I", b, o)[0]), st.log))
+    assert n == len(out)
+    return out
+
+
+def _rebuild(path):
+    asyncio.run(st._rebuild_index(path, bytearray(4 * st.RECORD_SIZE), st.log))
+
+
+def test_rebuild_index_points_to_the_first_record_of_every_hour(tmp_path):
+    stamps = [10 * DAY + 600 * i for i in range(30)]      # every 10 min, 00:00 .. 04:50
+    path = _write_segment(tmp_path, 10, stamps, torn={10 * DAY})
+    _rebuild(path)
+    idx = list(st._read_index(path))
+    # The torn first record is not indexed
+    assert idx[:6] == [1, 6, 12, 18, 24, st.INDEX_NO_ENTRY]
+    assert idx[6:] == [st.INDEX_NO_ENTRY] * 18
+
+
+def test_damaged_index_reads_as_missing(tmp_path):
+    path = _write_segment(tmp_path, 10, [10 * DAY])
+    with open(path + st.INDEX_EXT, "wb") as f:
+        f.write(b"\x00" * 10)
+    assert st._read_index(path) is None
+
+
+def test_range_with_and_without_index_is_the_same(tmp_path):
+    stamps = [10 * DAY + 300 * i for i in range(288)]
+    path = _write_segment(tmp_path, 10, stamps)
+    t1, t2 = 10 * DAY + 5 * 3600 + 100, 10 * DAY + 9 * 3600
+    expected = [ts for ts in stamps if t1 <= ts <= t2]
+    # No index: the tail is read backwards
+    assert _range(tmp_path, t1, t2) == expected
+    _rebuild(path)
+    assert _range(tmp_path, t1, t2) == expected
+
+
+def test_tail_reader_stops_at_the_window_and_skips_torn_records(tmp_path):
+    stamps = [10 * DAY + 300 * i for i in range(100)]
+    torn = {stamps[97], stamps[98]}
+    path = _write_segment(tmp_path, 10, stamps, torn=torn)
+    buf = bytearray(8 * st.RECORD_SIZE)
+    tail = lambda ts: asyncio.run(st._tail_first_record(path, ts, buf))
+    assert tail(stamps[90]) == 90
+    assert tail(stamps[90] - 1) == 90
+    assert tail(stamps[97]) == 99        # the torn ones are not the first valid match
+    assert tail(stamps[99] + 1) is None
+    assert tail(0) == 0
+    assert _range(tmp_path, stamps[95], stamps[99]) == [stamps[95], stamps[96], stamps[99]]
+
+
+def test_range_over_several_days_and_missing_segments(tmp_path):
+    day10 = [10 * DAY + 3600 * i for i in range(24)]
+    day12 = [12 * DAY + 3600 * i for i in range(24)]
+    _rebuild(_write_segment(tmp_path, 10, day10))
+    _write_segment(tmp_path, 12, day12)
+    t1, t2 = 10 * DAY + 20 * 3600, 12 * DAY + 2 * 3600
+    assert _range(tmp_path, t1, t2) == day10[20:] + day12[:3]
+
+
+def test_invalid_segment_is_skipped(tmp_path):
+    path = _write_segment(tmp_path, 10, [10 * DAY + 60])
+    with open(path + st.LOG_EXT, "r+b") as f:
+        f.write(b"JUNK")
+    assert _range(tmp_path, 10 * DAY, 11 * DAY) == []
+
+
+def test_index_record_updates_only_the_first_record_of_an_hour(tmp_path):
+    path = _write_segment(tmp_path, 10, [])
+    st._create_index(path, st.log)
+    st._index_record(path, 0, 10 * DAY + 3600, st.log)
+    st._index_record(path, 5, 10 * DAY + 3700, st.log)
+    idx = st._read_index(path)
+    assert idx[1] == 0
+    assert idx[0] == st.INDEX_NO_ENTRY
+    # No index file: nothing is created, the rebuild task makes it
+    os.remove(path + st.INDEX_EXT)
+    st._index_record(path, 0, 10 * DAY, st.log)
+    assert not os.path.exists(path + st.INDEX_EXT)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import struct
+import time
+
+import storage_task as st
+
+HEADER = "timestamp,temperature,humidity,co2,eco2,tvoc,aqi,pressure,lux\n"
+NOW = time.mktime((2026, 10, 18, 12, 0, 0, 0, 0))
+
+
+def _row(t, co2):
+    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d},21.50,45.25,{:d},400,25,2,1013.25,12.50\n".format(
+        t[0], t[1], t[2], t[3], t[4], t[5], co2)
+
+
+def _write_csv(path, timestamps, extra=""):
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for i, ts in enumerate(timestamps):
+            f.write(_row(time.localtime(ts), 500 + i))
+        f.write(extra)
+
+
+def _records(path):
+    with open(path + st.LOG_EXT, "rb") as f:
+        data = f.read()
+    assert data[:st.RECORD_SIZE] == st.LOG_HEADER
+    return [st._unpack_record(data, o) for o in range(st.RECORD_SIZE, len(data), st.RECORD_SIZE)
+            if st._record_ok(data, o)]
+
+
+def _import(csv_path, log_dir):
+    asyncio.run(st._import_legacy_csv(str(csv_path), str(log_dir), NOW, 7, st.log))
+
+
+def test_parse_csv_row():
+    ts, values = st._parse_csv_row(_row((2026, 10, 18, 11, 5, 0), 812))
+    assert ts == time.mktime((2026, 10, 18, 11, 5, 0, 0, 0))
+    assert values == [21.5, 45.25, 812, 400, 25, 2, 1013.25, 12.5]
+    assert st._parse_csv_row(HEADER) is None
+    assert st._parse_csv_row("2026-10-18 11:05,1,2\n") is None
+    assert st._parse_csv_row("garbage,1,2,3,4,5,6,7,8\n") is None
+
+
+def test_rows_of_the_last_days_go_to_day_segments(tmp_path):
+    csv_path = tmp_path / "sensor_logs.csv"
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    # 10 days, every 2 hours, up to now
+    stamps = list(range(NOW - 10 * 86400, NOW + 1, 7200))
+    _write_csv(csv_path, stamps, extra="2026-10-18 11:00:00,broken\n")
+    _import(csv_path, log_dir)
+
+    kept = [ts for ts in stamps if ts >= NOW - 7 * 86400]
+    names = sorted(os.listdir(log_dir))
+    segments = [n for n in names if n.endswith(st.LOG_EXT)]
+    assert segments[0] == "2026-10-11.bin" and segments[-1] == "2026-10-18.bin"
+    assert not [n for n in names if n.endswith(st.TMP_EXT)]
+
+    records = []
+    for name in segments:
+        records += _records(str(log_dir / name[:-len(st.LOG_EXT)]))
+    assert [r[0] for r in records] == kept
+    ts, temp, hum, co2, _, _, _, pressure, lux = records[-1]
+    assert (temp, hum, co2, pressure, lux) == (21.5, 45.25, 500 + len(stamps) - 1, 1013.25, 12.5)
+
+    # Indexed, so the history restore doesn't have to scan
+    today = str(log_dir / "2026-10-18")
+    assert list(st._read_index(today))[:3] == [0, 0xFFFFFFFF, 1]
+
+    # Renamed aside, never imported twice
+    assert not csv_path.exists()
+    assert (tmp_path / ("sensor_logs.csv" + st.LEGACY_DONE_EXT)).exists()
+
+
+def test_existing_segments_are_not_overwritten(tmp_path):
+    csv_path = tmp_path / "sensor_logs.csv"
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    today = str(log_dir / "2026-10-18")
+    with open(today + st.LOG_EXT, "wb") as f:
+        f.write(st.LOG_HEADER)
+    _write_csv(csv_path, [NOW - 86400, NOW - 3600])
+    _import(csv_path, log_dir)
+    assert _records(today) == []
+    assert [r[0] for r in _records(str(log_dir / "2026-10-17"))] == [NOW - 86400]
+
+
+def test_failed_import_keeps_the_csv(tmp_path, monkeypatch):
+    csv_path = tmp_path / "sensor_logs.csv"
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    _write_csv(csv_path, [NOW - 86400, NOW - 3600])
+
+    def fail(path, buf, log):
+        raise OSError(5)
+
+    monkeypatch.setattr(st, "_rebuild_index", fail)
+    _import(csv_path, log_dir)
+    assert csv_path.exists()
+    # The day that was complete stays, the next boot imports the rest
+    assert sorted(os.listdir(log_dir)) == ["2026-10-17.bin"]
+
+
+def test_no_csv_nothing_to_do(tmp_path):
+    _import(tmp_path / "sensor_logs.csv", tmp_path)
+    assert os.listdir(tmp_path) == []
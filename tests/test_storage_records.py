@@ -0,0 +1,65 @@
+import pytest
+
+import storage_task as st
+
+VALUES = (21.37, 45.5, 812, 400, 25, 2, 1013.25, 123.45)
+
+
+def _record(ts=86400, values=VALUES):
+    buf = bytearray(st.RECORD_SIZE)
+    st._pack_record(buf, ts, values)
+    return buf
+
+
+def test_record_size():
+    assert st.RECORD_SIZE == 28
+    assert len(st.LOG_HEADER) == st.RECORD_SIZE
+
+
+def test_pack_unpack_round_trip():
+    buf = _record()
+    assert st._record_ok(buf)
+    ts, temp, hum, co2, eco2, tvoc, aqi, pressure, lux = st._unpack_record(buf)
+    assert ts == 86400
+    assert temp == pytest.approx(21.37)
+    assert hum == pytest.approx(45.5)
+    assert (co2, eco2, tvoc, aqi) == (812, 400, 25, 2)
+    assert pressure == pytest.approx(1013.25)
+    assert lux == pytest.approx(123.45)
+
+
+def test_missing_values_and_clamping():
+    buf = _record(values=(None, None, 70000, -5, None, 300, None, None))
+    _, temp, _, co2, eco2, _, aqi, _, _ = st._unpack_record(buf)
+    assert temp == 0
+    assert (co2, eco2, aqi) == (65535, 0, 255)
+    assert st._record_ok(buf)
+
+
+def test_record_at_an_offset():
+    buf = bytearray(3 * st.RECORD_SIZE)
+    buf[st.RECORD_SIZE:2 * st.RECORD_SIZE] = _record(ts=600)
+    assert st._record_ok(buf, st.RECORD_SIZE)
+    assert not st._record_ok(buf, 0)
+    assert st._unpack_record(buf, st.RECORD_SIZE)[0] == 600
+
+
+def test_corrupted_data_fails_the_crc():
+    buf = _record()
+    buf[6] ^= 0x01
+    assert not st._record_ok(buf)
+
+
+def test_torn_record_without_commit_marker():
+    # Power lost before the last bytes reached the card
+    full = _record()
+    torn = bytearray(st.RECORD_SIZE)
+    torn[:st.RECORD_SIZE - 2] = full[:st.RECORD_SIZE - 2]
+    assert not st._record_ok(torn)
+    assert not st._record_ok(bytearray(st.RECORD_SIZE))
+
+
+def test_wrong_commit_marker_with_valid_crc():
+    buf = _record()
+    buf[st.RECORD_SIZE - 2:] = b"\x00\x00"
+    assert not st._record_ok(buf)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import struct
+import time
+
+import storage_task as st
+
+DAY = 86400
+
+
+def _fields(ts, co2, temp=21.5):
+    rec = bytearray(st.RECORD_SIZE)
+    st._pack_record(rec, ts, (temp, 50, co2, 400, 10, 1, 1000, 5))
+    return struct.unpack(st.RECORD_FMT, rec)
+
+
+def _windows(path, t1=0, t2=0xFFFFFFFF):
+    out = []
+    buf = bytearray(3 * st.ROLLUP_SIZE)
+    n = asyncio.run(st._read_rollup_range(path, t1, t2, buf,
+                                          lambda b, o: out.append(st._unpack_rollup(b, o))))
+    assert n == len(out)
+    return out
+
+
+def test_window_is_written_when_a_later_one_starts(tmp_path):
+    path = str(tmp_path / "1h.rlp")
+    r = st.Rollup(path, 3600)
+    for ts, co2 in ((3600, 500), (4000, 700), (7000, 600)):
+        r.add(_fields(ts, co2), st.log)
+    # The open window is only in RAM, the file is created on first close
+    assert not os.path.exists(path)
+    r.add(_fields(7200, 900), st.log)
+
+    (start, count, lo, hi, mean), = _windows(path)
+    assert (start, count) == (3600, 3)
+    assert (lo[2], hi[2], mean[2]) == (500, 700, 600)
+    assert lo[0] == hi[0] == mean[0] == 21.5
+    assert r.last == 3600 and r.start == 7200 and r.count == 1
+
+
+def test_old_windows_and_backward_clock_are_ignored(tmp_path):
+    path = str(tmp_path / "1h.rlp")
+    r = st.Rollup(path, 3600)
+    r.add(_fields(3600, 500), st.log)
+    r.add(_fields(7200, 600), st.log)
+    r.add(_fields(3700, 9999), st.log)      # window already in the file
+    r.add(_fields(10800, 700), st.log)
+    r.add(_fields(7300, 9999), st.log)      # clock went back into a closed window
+    r.close(st.log)
+    assert [(w[0], w[1], w[3][2]) for w in _windows(path)] == \
+        [(3600, 1, 500), (7200, 1, 600), (10800, 1, 700)]
+
+
+def test_torn_and_invalid_tier_files_are_repaired(tmp_path):
+    path = str(tmp_path / "1h.rlp")
+    r = st.Rollup(path, 3600)
+    for ts in (0, 3600, 7200):
+        r.add(_fields(ts, 500), st.log)
+    r.close(st.log)
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 10)
+    assert st._ensure_rollup_file(path, st.log) == 7200
+    assert os.path.getsize(path) % st.ROLLUP_SIZE == 0
+    assert [w[0] for w in _windows(path)] == [0, 3600, 7200]
+
+    with open(path, "r+b") as f:
+        f.write(b"JUNK")
+    assert st._ensure_rollup_file(path, st.log) is None
+    assert os.path.exists(str(tmp_path / "1h") + st.BAD_EXT)
+    assert _windows(path) == []
+
+
+def test_range_reader_bisects_to_the_first_window(tmp_path):
+    path = str(tmp_path / "1h.rlp")
+    r = st.Rollup(path, 3600)
+    for h in range(50):
+        r.add(_fields(h * 3600, h), st.log)
+    r.close(st.log)
+    assert [w[0] // 3600 for w in _windows(path, 17 * 3600, 23 * 3600)] == list(range(17, 24))
+    assert [w[0] // 3600 for w in _windows(path, 17 * 3600 - 1, 17 * 3600 + 1)] == [17]
+    assert _windows(path, 60 * 3600) == []
+    assert len(_windows(path)) == 50
+
+
+def _write_segment(log_dir, day, stamps):
+    path = st._segment_path(str(log_dir), time.localtime(day * DAY))
+    rec = bytearray(st.RECORD_SIZE)
+    with open(path + st.LOG_EXT, "wb") as f:
+        f.write(st.LOG_HEADER)
+        for ts in stamps:
+            st._pack_record(rec, ts, (20, 50, 400 + ts // 3600 % 24, 0, 0, 1, 1000, 5))
+            f.write(rec)
+
+
+def _tiers(tmp_path):
+    return [st.Rollup(str(tmp_path / (name + st.ROLLUP_EXT)), seconds)
+            for name, seconds in st.ROLLUP_TIERS]
+
+
+def test_restore_rolls_up_the_log_and_keeps_the_open_windows(tmp_path):
+    for day in (10, 11):
+        _write_segment(tmp_path, day, [day * DAY + 600 * i for i in range(144)])
+    _write_segment(tmp_path, 12, [12 * DAY + 600 * i for i in range(20)])   # until 03:10
+    now = 12 * DAY + 3 * 3600 + 1200
+
+    tiers = _tiers(tmp_path)
+    asyncio.run(st._restore_rollups(str(tmp_path), tiers, now, 3, st.log))
+    hourly, daily = tiers
+    assert [w[0] for w in _windows(hourly.path)] == [10 * DAY + h * 3600 for h in range(51)]
+    assert hourly.start == 12 * DAY + 3 * 3600 and hourly.count == 2
+    day10, day11 = _windows(daily.path)
+    assert (day10[0], day10[1], day10[2][2], day10[3][2]) == (10 * DAY, 144, 400, 423)
+    assert day11[0] == 11 * DAY
+    assert daily.start == 12 * DAY and daily.count == 20
+
+
+def test_restore_continues_after_the_last_daily_window(tmp_path):
+    for day in (10, 11):
+        _write_segment(tmp_path, day, [day * DAY + 600 * i for i in range(144)])
+    asyncio.run(st._restore_rollups(str(tmp_path), _tiers(tmp_path), 11 * DAY + 600, 3, st.log))
+
+    # Reboot a day later: day 11 is rolled up once, no window is written twice
+    _write_segment(tmp_path, 12, [12 * DAY + 600 * i for i in range(6)])
+    tiers = _tiers(tmp_path)
+    asyncio.run(st._restore_rollups(str(tmp_path), tiers, 12 * DAY + 3600, 3, st.log))
+    hourly, daily = tiers
+    assert [w[0] for w in _windows(daily.path)] == [10 * DAY, 11 * DAY]
+    starts = [w[0] for w in _windows(hourly.path)]
+    assert starts == sorted(set(starts))
+    assert starts[-1] == 11 * DAY + 23 * 3600
+    assert hourly.start == 12 * DAY and hourly.count == 6